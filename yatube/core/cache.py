@@ -0,0 +1,266 @@
+import math
+import pickle
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+from .profiling import record_cache_lookup
+
+GENERATION_KEY = 'tiered:generation'
+JOURNAL_KEY = 'tiered:invalidated'
+JOURNAL_SIZE = 1000
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class LocalTier:
+    """Ограниченный LRU-кэш процесса, общий для всех его потоков.
+
+    Как и LocMemCache, хранит сериализованные значения: иначе запросы
+    делили бы и меняли один и тот же объект.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.generation = None
+        self.seen = None
+        self.synced_at = 0.0
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            envelope, deadline = item
+            if deadline <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+        return pickle.loads(envelope)
+
+    def set(self, key, envelope, ttl):
+        envelope = pickle.dumps(envelope, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (envelope, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кэш: LRU в памяти процесса перед общим L2.
+
+    L2 — любой бэкенд Django (по умолчанию файловый, подойдёт и Redis),
+    он виден всем воркерам. Значения лежат в конвертах
+    (значение, срок жизни, время пересчёта); целые числа лежат в L2 как
+    есть, чтобы incr выполнял сам L2. Удаления и incr пишут ключ
+    в журнал в L2; остальные процессы читают журнал не чаще раза в
+    SYNC_INTERVAL секунд и выбрасывают из L1 только эти ключи. Поэтому
+    смена версионированного ключа вроде posts:feed_version доходит до
+    всех воркеров. clear и переполнение журнала сбрасывают L1 целиком.
+    Перезапись обычного ключа другим процессом, как и потерянная при
+    гонке запись журнала, становится видна не позже чем через
+    L1_TIMEOUT секунд.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l1_timeout = options.get('L1_TIMEOUT', 5)
+        self.sync_interval = options.get('SYNC_INTERVAL', 1)
+        self.lock_timeout = options.get('LOCK_TIMEOUT', 10)
+        self.early_expiry_beta = options.get('EARLY_EXPIRY_BETA', 1.0)
+        self.l2 = import_string(options.get(
+            'L2_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache',
+        ))(location, {
+            'TIMEOUT': params.get('TIMEOUT', 300),
+            'KEY_PREFIX': params.get('KEY_PREFIX', ''),
+            'OPTIONS': options.get('L2_OPTIONS', {}),
+        })
+        with _tiers_lock:
+            self.l1 = _tiers.setdefault(
+                location, LocalTier(options.get('L1_MAX_ENTRIES', 1000)))
+
+    def _sync(self):
+        now = time.monotonic()
+        if now - self.l1.synced_at < self.sync_interval:
+            return
+        self.l1.synced_at = now
+        generation = self.l2.get(GENERATION_KEY)
+        journal = self.l2.get(JOURNAL_KEY) or []
+        seen = self.l1.seen
+        missed = (seen is None or generation != self.l1.generation
+                  or len(journal) >= JOURNAL_SIZE and journal[0][0] > seen)
+        if missed:
+            self.l1.clear()
+        else:
+            for stamp, key in journal:
+                if stamp > seen:
+                    self.l1.delete(key)
+        self.l1.generation = generation
+        self.l1.seen = journal[-1][0] if journal else 0
+
+    def _invalidate(self, local_key):
+        journal = self.l2.get(JOURNAL_KEY) or []
+        # Метки растут в порядке журнала, даже если часы процессов
+        # немного расходятся.
+        stamp = max(time.time_ns(), journal[-1][0] + 1 if journal else 0)
+        journal = journal[1 - JOURNAL_SIZE:] + [(stamp, local_key)]
+        self.l2.set(JOURNAL_KEY, journal, timeout=None)
+
+    def _broadcast(self):
+        generation = time.time_ns()
+        self.l2.set(GENERATION_KEY, generation, timeout=None)
+        self.l1.generation = generation
+
+    def _remember(self, key, envelope):
+        ttl = self.l1_timeout
+        if envelope[1] is not None:
+            ttl = min(ttl, envelope[1] - time.time())
+        if ttl > 0:
+            self.l1.set(key, envelope, ttl)
+
+    def _load(self, key, version):
+        envelope = self.l2.get(key, version=version)
+        if type(envelope) is int:
+            envelope = (envelope, None, 0.0)
+        return envelope
+
+    def _fetch(self, key, version):
+        self._sync()
+        local_key = self.make_key(key, version)
+        self.validate_key(local_key)
+        envelope = self.l1.get(local_key)
+        if envelope is None:
+            envelope = self._load(key, version)
+            if envelope is not None:
+                self._remember(local_key, envelope)
+        return envelope
+
+    def _envelope(self, value, timeout, delta=0.0):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        expires = None if timeout is None else time.time() + timeout
+        return (value, expires, delta), timeout
+
+    @staticmethod
+    def _packed(envelope):
+        return envelope[0] if type(envelope[0]) is int else envelope
+
+    def get(self, key, default=None, version=None):
+        envelope = self._fetch(key, version)
+        record_cache_lookup(envelope is not None)
+        return default if envelope is None else envelope[0]
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None,
+            delta=0.0):
+        envelope, timeout = self._envelope(value, timeout, delta)
+        self.l2.set(key, self._packed(envelope), timeout=timeout,
+                    version=version)
+        self._remember(self.make_key(key, version), envelope)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        envelope, timeout = self._envelope(value, timeout)
+        if not self.l2.add(key, self._packed(envelope), timeout=timeout,
+                           version=version):
+            return False
+        self._remember(self.make_key(key, version), envelope)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l1.delete(self.make_key(key, version))
+        return self.l2.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.l2.delete(key, version=version)
+        self.l1.delete(self.make_key(key, version))
+        self._invalidate(self.make_key(key, version))
+
+    def incr(self, key, delta=1, version=None):
+        # Атомарность — как у incr самого L2: у LocMemCache и Redis она
+        # есть, у файлового кэша нет.
+        value = self.l2.incr(key, delta, version=version)
+        local_key = self.make_key(key, version)
+        self.l1.delete(local_key)
+        self._invalidate(local_key)
+        return value
+
+    def clear(self):
+        self.l2.clear()
+        self.l1.clear()
+        self._broadcast()
+
+    def _expires_early(self, envelope):
+        """Вероятностное досрочное истечение (XFetch)."""
+        _, expires, delta = envelope
+        if expires is None or not delta:
+            return False
+        gap = -delta * self.early_expiry_beta * math.log(
+            1 - random.random())
+        return time.time() + gap >= expires
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT,
+                   version=None):
+        """get_or_set с защитой от одновременного пересчёта.
+
+        Значение пересчитывает только владелец блокировки в L2, остальные
+        отдают старое значение или коротко ждут нового.
+        """
+        envelope = self._fetch(key, version)
+        if envelope is not None and not self._expires_early(envelope):
+            record_cache_lookup(True)
+            return envelope[0]
+        record_cache_lookup(False)
+        lock = f'{key}:lock'
+        owner = acquire_lock(self, lock, self.lock_timeout)
+        if not owner:
+            if envelope is not None:
+                return envelope[0]
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                envelope = self._load(key, version)
+                if envelope is not None:
+                    return envelope[0]
+        try:
+            started = time.monotonic()
+            value = default() if callable(default) else default
+            if value is not None:
+                self.set(key, value, timeout, version,
+                         delta=time.monotonic() - started)
+        finally:
+            if owner:
+                release_lock(self, lock)
+        return value
+
+
+def acquire_lock(cache, key, timeout):
+    """Блокировка на add(). TieredCache держит её только в общем L2.
+
+    Иначе снятие блокировки через delete() сбрасывало бы L1 всех воркеров.
+    """
+    if isinstance(cache, TieredCache):
+        cache = cache.l2
+    return cache.add(key, 1, timeout)
+
+
+def release_lock(cache, key):
+    if isinstance(cache, TieredCache):
+        cache = cache.l2
+    cache.delete(key)
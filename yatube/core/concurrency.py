@@ -0,0 +1,48 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from .routers import is_reading_from_replica, reading_from_replica
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.QUERY_WORKERS,
+                thread_name_prefix='queries',
+            )
+    return _executor
+
+
+def _run(call, replica):
+    try:
+        if not replica:
+            return call()
+        with reading_from_replica():
+            return call()
+    finally:
+        close_old_connections()
+
+
+def gather(*calls):
+    """Выполняет независимые запросы одновременно и возвращает их результаты.
+
+    Каждый вызов идёт в своём потоке со своим соединением, так что время
+    ответа — самый долгий запрос, а не сумма. Внутри транзакции другие
+    соединения её не видят, поэтому там, как и при QUERY_WORKERS < 2,
+    вызовы выполняются по очереди. Исключение вызова пробрасывается.
+    """
+    if (settings.QUERY_WORKERS < 2 or len(calls) < 2
+            or any(conn.in_atomic_block for conn in connections.all())):
+        return [call() for call in calls]
+    replica = is_reading_from_replica()
+    futures = [_get_executor().submit(_run, call, replica)
+               for call in calls]
+    return [future.result() for future in futures]
@@ -0,0 +1,107 @@
+import mimetypes
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.http import http_date
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class MediaResponse(FileResponse):
+    # Блок 4 КБ из FileResponse слишком мелкий для картинок.
+    block_size = 64 * 2 ** 10
+
+
+class FileRange:
+    """Файл, который читается только в пределах диапазона.
+
+    fileno() нет намеренно: иначе сервер отдал бы sendfile'ом весь
+    остаток файла, не глядя на Content-Length.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """Первый диапазон из заголовка Range как (начало, конец) включительно.
+
+    None — заголовка нет или он некорректен, файл отдаётся целиком.
+    Несколько диапазонов тоже отдаём целиком: так разрешает RFC 7233.
+    ValueError — диапазон за пределами файла.
+    """
+    match = RANGE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if not start:
+        if not int(end) or not size:
+            raise ValueError(header)
+        return max(size - int(end), 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size:
+        raise ValueError(header)
+    if start > end:
+        return None
+    return start, end
+
+
+def content_type(path):
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def sendfile(name, path):
+    """Пустой ответ, файл по которому отдаст фронтовой сервер."""
+    response = HttpResponse(content_type=content_type(path))
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_ACCEL_PREFIX + quote(name))
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+def file_response(request, path, stat):
+    """Отдаёт файл сам, с поддержкой Range.
+
+    Целый файл уходит через wsgi.file_wrapper, и сервер вроде gunicorn
+    передаёт его через os.sendfile без копирования в Python.
+    """
+    size = stat.st_size
+    header = request.META.get('HTTP_RANGE', '')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != http_date(stat.st_mtime):
+        header = ''
+    try:
+        bounds = parse_range(header, size) if header else None
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    file = open(path, 'rb')
+    if bounds is None:
+        response = MediaResponse(file, content_type=content_type(path))
+    else:
+        start, end = bounds
+        response = MediaResponse(
+            FileRange(file, start, end - start + 1),
+            content_type=content_type(path), status=206)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,68 @@
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import profiling
+from .routers import PIN_COOKIE
+
+
+class ProfilingMiddleware:
+    """Замеряет выборку запросов; сотрудникам отдаёт Server-Timing."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+        stats = profiling.RequestStats()
+        profiling.activate(stats)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            profiling.activate(None)
+        total = time.perf_counter() - start
+        match = request.resolver_match
+        profiling.histogram.record(
+            match.view_name if match else 'unresolved', total, stats)
+        # Метрики выдают устройство сайта, поэтому заголовок — только
+        # сотрудникам.
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_staff:
+            return response
+        response['Server-Timing'] = ', '.join((
+            f'total;dur={total * 1000:.1f}',
+            f'sql;dur={stats.sql_time * 1000:.1f};'
+            f'desc="{stats.sql_count} queries"',
+            f'tpl;dur={stats.template_time * 1000:.1f}',
+            f'cache;desc="{stats.cache_hits} hits, '
+            f'{stats.cache_misses} misses"',
+        ))
+        return response
+
+
+class ReplicaPinMiddleware:
+    """Закрепляет за основной базой того, кто только что писал.
+
+    После запроса с изменяющим методом ставится кука на
+    REPLICA_PIN_SECONDS: за это время реплики успевают догнать основную базу.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.pinned_to_primary = PIN_COOKIE in request.COOKIES
+        response = self.get_response(request)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            response.set_cookie(PIN_COOKIE, '1',
+                                max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True)
+        return response
@@ -0,0 +1,154 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.template.backends.django import DjangoTemplates, Template
+
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf'))
+
+_local = threading.local()
+
+
+class RequestStats:
+    """Метрики одного профилируемого запроса."""
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_time += time.perf_counter() - start
+
+
+def current():
+    return getattr(_local, 'stats', None)
+
+
+def activate(stats):
+    _local.stats = stats
+
+
+def record_cache_lookup(hit):
+    stats = current()
+    if stats is None:
+        return
+    if hit:
+        stats.cache_hits += 1
+    else:
+        stats.cache_misses += 1
+
+
+class ProfiledTemplate(Template):
+    """Шаблон, время рендера которого попадает в метрики запроса."""
+
+    def render(self, context=None, request=None):
+        stats = current()
+        if stats is None or stats.rendering:
+            return super().render(context, request)
+        stats.rendering = True
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - start
+            stats.rendering = False
+
+
+class ProfilingTemplates(DjangoTemplates):
+    """DjangoTemplates, который отдаёт ProfiledTemplate.
+
+    Меряется только рендер верхнего уровня и только в запросах из
+    выборки ProfilingMiddleware: include и extends идут мимо бэкенда.
+    """
+
+    def from_string(self, template_code):
+        return ProfiledTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return ProfiledTemplate(template.template, self)
+
+
+class Histogram:
+    """Агрегированные по view метрики с гистограммой времени ответа."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, total, stats):
+        with self._lock:
+            data = self._views.setdefault(view, {
+                'count': 0,
+                'total_ms': 0.0,
+                'sql_count': 0,
+                'sql_ms': 0.0,
+                'template_ms': 0.0,
+                'cache_hits': 0,
+                'cache_misses': 0,
+                'buckets': [0] * len(BUCKETS_MS),
+            })
+            data['count'] += 1
+            data['total_ms'] += total * 1000
+            data['sql_count'] += stats.sql_count
+            data['sql_ms'] += stats.sql_time * 1000
+            data['template_ms'] += stats.template_time * 1000
+            data['cache_hits'] += stats.cache_hits
+            data['cache_misses'] += stats.cache_misses
+            data['buckets'][bisect_left(BUCKETS_MS, total * 1000)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            views = {
+                view: dict(data, buckets=dict(zip(
+                    [str(bound) for bound in BUCKETS_MS], data['buckets'])))
+                for view, data in self._views.items()
+            }
+        for data in views.values():
+            for key in ('total_ms', 'sql_count', 'sql_ms', 'template_ms'):
+                data[f'avg_{key}'] = round(data[key] / data['count'], 2)
+        return views
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+histogram = Histogram()
+
+
+class FragmentMetrics:
+    """Исходы {% cache %} по фрагментам: попадания, промахи, устаревшие."""
+
+    OUTCOMES = ('hits', 'misses', 'stale')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fragments = {}
+
+    def record(self, name, outcome):
+        with self._lock:
+            counts = self._fragments.setdefault(
+                name, dict.fromkeys(self.OUTCOMES, 0))
+            counts[outcome] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(counts)
+                    for name, counts in self._fragments.items()}
+
+    def reset(self):
+        with self._lock:
+            self._fragments.clear()
+
+
+fragments = FragmentMetrics()
@@ -0,0 +1,89 @@
+import random
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'primary_pin'
+
+_state = threading.local()
+
+
+def is_reading_from_replica():
+    return getattr(_state, 'replica', False)
+
+
+@contextmanager
+def reading_from_replica(replica=True):
+    previous = is_reading_from_replica()
+    _state.replica = replica
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+def reading_from_primary():
+    return reading_from_replica(False)
+
+
+def may_fill_cache():
+    return not getattr(_state, 'lagging', False)
+
+
+@contextmanager
+def replica_may_lag():
+    """Прочитанное внутри блока может отставать: в общий кэш его не кладём."""
+    previous = getattr(_state, 'lagging', False)
+    _state.lagging = True
+    try:
+        yield
+    finally:
+        _state.lagging = previous
+
+
+class ReplicaRouter:
+    """Чтение внутри use_replica идёт на реплику, всё остальное — в default.
+
+    Реплики перечислены в REPLICA_DATABASES; если их нет, роутер ничего
+    не меняет. Мигрируется только основная база: реплики её копируют.
+    """
+
+    def db_for_read(self, model, **hints):
+        if is_reading_from_replica() and settings.REPLICA_DATABASES:
+            return random.choice(settings.REPLICA_DATABASES)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
+
+
+def use_replica(view):
+    """Читает данные представления с реплики.
+
+    Пользователь, который недавно что-то записал, закреплён за основной
+    базой (см. ReplicaPinMiddleware) и видит свои изменения сразу.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if getattr(request, 'pinned_to_primary', False):
+            return view(request, *args, **kwargs)
+        # Сессию и пользователя читаем из основной базы: на реплике
+        # только что созданной сессии может ещё не быть.
+        request.user.is_authenticated
+        with reading_from_replica():
+            return view(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,64 @@
+import hashlib
+import os
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файлы по хешу содержимого: posts/ab/cd/abcd….jpg.
+
+    Одинаковые файлы хранятся один раз, а имя из запроса сохраняет только
+    каталог и расширение. Повторное сохранение обновляет время изменения
+    файла, чтобы сборщик мусора не удалил его из-под новой ссылки
+    (см. delete_if_stale).
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(
+            directory, digest[:2], digest[2:4], digest + extension)
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        try:
+            os.utime(self.path(name))
+            return name
+        except FileNotFoundError:
+            pass
+        # Пишем во временный файл и атомарно переносим: при гонке двух
+        # загрузок одного файла содержимое всё равно одинаковое.
+        temporary = super()._save(f'{name}.{uuid.uuid4().hex}.tmp', content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
+
+    def delete_if_stale(self, name, cutoff):
+        """Удаляет файл, если его не сохраняли заново с cutoff (timestamp).
+
+        Файл сначала атомарно уходит под временное имя. Сохранение того же
+        содержимого либо успело обновить время изменения, и тогда файл
+        возвращается на место, либо уже не находит его и пишет заново.
+        Возвращает True, если файл удалён.
+        """
+        path = self.path(name)
+        trash = f'{path}.{uuid.uuid4().hex}.trash'
+        try:
+            os.replace(path, trash)
+        except FileNotFoundError:
+            return False
+        if os.path.getmtime(trash) >= cutoff:
+            os.replace(trash, path)
+            return False
+        os.remove(trash)
+        return True
@@ -0,0 +1,140 @@
+import time
+
+from django import template
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.templatetags.cache import CacheNode
+
+from ..cache import acquire_lock, release_lock
+from ..profiling import fragments
+from ..routers import may_fill_cache
+
+register = template.Library()
+
+# Сколько после истечения ещё можно отдавать старый фрагмент.
+STALE_TIMEOUT = 5 * 60
+LOCK_TIMEOUT = 10
+WAIT_TIMEOUT = 1
+WAIT_STEP = 0.05
+
+
+def _is_fresh(entry, version):
+    return (entry is not None and entry[2:] == (version,)
+            and (entry[1] is None or time.time() < entry[1]))
+
+
+class FragmentCacheNode(CacheNode):
+    """CacheNode с единственным пересчётом и stale-while-revalidate.
+
+    Пересобирает фрагмент тот, кто взял блокировку; остальные отдают
+    устаревшую копию, а если её нет — недолго ждут свежую. Версия из
+    version=… не входит в ключ, а хранится рядом с фрагментом: после её
+    смены прошлая копия остаётся и отдаётся как устаревшая.
+    """
+
+    def __init__(self, *args, version_var=None):
+        super().__init__(*args)
+        self.version_var = version_var
+
+    def render(self, context):
+        expire_time = self.resolve_expire_time(context)
+        fragment_cache = self.resolve_cache(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        version = self.version_var and self.version_var.resolve(context)
+        key = make_template_fragment_key(self.fragment_name, vary_on)
+        entry = fragment_cache.get(key)
+        if _is_fresh(entry, version):
+            fragments.record(self.fragment_name, 'hits')
+            return entry[0]
+        if not may_fill_cache():
+            fragments.record(self.fragment_name, 'misses')
+            return self.nodelist.render(context)
+        lock = f'{key}.lock'
+        if acquire_lock(fragment_cache, lock, LOCK_TIMEOUT):
+            try:
+                value = self.nodelist.render(context)
+                self.store(fragment_cache, key, value, expire_time, version)
+            finally:
+                release_lock(fragment_cache, lock)
+            fragments.record(self.fragment_name, 'misses')
+            return value
+        if entry is not None:
+            fragments.record(self.fragment_name, 'stale')
+            return entry[0]
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_STEP)
+            entry = fragment_cache.get(key)
+            if _is_fresh(entry, version):
+                fragments.record(self.fragment_name, 'hits')
+                return entry[0]
+        fragments.record(self.fragment_name, 'misses')
+        return self.nodelist.render(context)
+
+    def store(self, fragment_cache, key, value, expire_time, version):
+        if expire_time is None:
+            fragment_cache.set(key, (value, None, version), None)
+            return
+        fragment_cache.set(key, (value, time.time() + expire_time, version),
+                           expire_time + STALE_TIMEOUT)
+
+    def resolve_expire_time(self, context):
+        try:
+            expire_time = self.expire_time_var.resolve(context)
+        except template.VariableDoesNotExist:
+            raise template.TemplateSyntaxError(
+                '"cache" tag got an unknown variable: %r'
+                % self.expire_time_var.var)
+        if expire_time is None:
+            return None
+        try:
+            return int(expire_time)
+        except (ValueError, TypeError):
+            raise template.TemplateSyntaxError(
+                '"cache" tag got a non-integer timeout value: %r'
+                % expire_time)
+
+    def resolve_cache(self, context):
+        if not self.cache_name:
+            try:
+                return caches['template_fragments']
+            except InvalidCacheBackendError:
+                return caches['default']
+        try:
+            cache_name = self.cache_name.resolve(context)
+        except template.VariableDoesNotExist:
+            raise template.TemplateSyntaxError(
+                '"cache" tag got an unknown variable: %r'
+                % self.cache_name.var)
+        try:
+            return caches[cache_name]
+        except InvalidCacheBackendError:
+            raise template.TemplateSyntaxError(
+                'Invalid cache name specified for cache tag: %r'
+                % cache_name)
+
+
+@register.tag('cache')
+def do_cache(parser, token):
+    """Замена {% cache %} с тем же синтаксисом, включая using="…".
+
+    Дополнительно принимает version=…: см. FragmentCacheNode.
+    """
+    nodelist = parser.parse(('endcache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            "'%r' tag requires at least 2 arguments." % tokens[0])
+    options = {}
+    while len(tokens) > 3 and tokens[-1].startswith(('using=', 'version=')):
+        name, value = tokens.pop().split('=', 1)
+        options[name] = parser.compile_filter(value)
+    return FragmentCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(bit) for bit in tokens[3:]],
+        options.get('using'),
+        version_var=options.get('version'),
+    )
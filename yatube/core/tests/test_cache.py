@@ -0,0 +1,128 @@
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..cache import LocalTier, TieredCache
+
+
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location)
+        self.cache = self.worker()
+
+    def worker(self, **options):
+        """Отдельный L1 поверх общего L2 — как у другого процесса."""
+        cache = TieredCache(self.location, {
+            'OPTIONS': dict({'SYNC_INTERVAL': 0}, **options),
+        })
+        cache.l1 = LocalTier(options.get('L1_MAX_ENTRIES', 1000))
+        return cache
+
+    def test_values_are_shared_between_workers(self):
+        other = self.worker()
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(other.get('key'), {'value': 1})
+        self.assertIsNone(other.get('missing'))
+
+    def test_local_tier_is_bounded_lru(self):
+        cache = self.worker(L1_MAX_ENTRIES=2)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        self.assertEqual(list(cache.l1.entries), [':1:b', ':1:c'])
+        self.assertEqual(cache.get('a'), 'a')
+
+    def test_local_tier_returns_copies(self):
+        self.cache.set('key', [])
+        self.cache.get('key').append(1)
+        self.assertEqual(self.cache.get('key'), [])
+
+    def test_invalidation_is_broadcast(self):
+        other = self.worker()
+        self.cache.set('version', 1, None)
+        self.assertEqual(other.get('version'), 1)
+        self.cache.incr('version')
+        self.assertEqual(other.get('version'), 2)
+        self.cache.delete('version')
+        self.assertIsNone(other.get('version'))
+
+    def test_invalidation_keeps_other_keys(self):
+        other = self.worker()
+        self.cache.set('version', 1, None)
+        self.cache.set('page', 'html')
+        other.get('version')
+        other.get('page')
+        self.cache.incr('version')
+        self.assertEqual(other.get('version'), 2)
+        self.assertIn(':1:page', other.l1.entries)
+
+    def test_journal_overflow_clears_local_tier(self):
+        other = self.worker()
+        self.cache.set('page', 'html')
+        other.get('page')
+        with mock.patch('core.cache.JOURNAL_SIZE', 2):
+            for key in ('a', 'b', 'c'):
+                self.cache.delete(key)
+            other.get('missing')
+        self.assertNotIn(':1:page', other.l1.entries)
+
+    def test_clear(self):
+        other = self.worker()
+        self.cache.set('key', 1)
+        other.get('key')
+        self.cache.clear()
+        self.assertIsNone(other.get('key'))
+
+    def test_incr_is_atomic_in_l2(self):
+        def worker():
+            return self.worker(
+                L2_BACKEND='django.core.cache.backends.locmem.LocMemCache')
+
+        cache = worker()
+        cache.set('counter', 0, None)
+        threads = [
+            threading.Thread(target=lambda cache=worker(): [
+                cache.incr('counter') for _ in range(50)])
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.get('counter'), 200)
+
+    def test_incr_missing_key(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_get_or_set_computes_once(self):
+        compute = mock.Mock(return_value='value')
+        self.assertEqual(self.cache.get_or_set('key', compute), 'value')
+        self.assertEqual(self.cache.get_or_set('key', compute), 'value')
+        compute.assert_called_once_with()
+
+    def test_stale_value_is_served_while_locked(self):
+        self.cache.set('key', 'old', 60, delta=1000)
+        self.cache.l2.add('key:lock', 1)
+        compute = mock.Mock(return_value='new')
+        self.assertEqual(self.cache.get_or_set('key', compute), 'old')
+        compute.assert_not_called()
+
+    @mock.patch('core.cache.random.random', return_value=0.5)
+    def test_early_expiry(self, random):
+        self.cache.set('key', 'old', 60, delta=1000)
+        self.assertEqual(
+            self.cache.get_or_set('key', lambda: 'new', 60), 'new')
+        self.cache.set('key', 'old', 60, delta=0.001)
+        self.assertEqual(
+            self.cache.get_or_set('key', lambda: 'new', 60), 'old')
+
+    def test_expired_value(self):
+        self.cache.set('key', 'value', 0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.worker().get('key'))
+        self.assertIsNone(self.cache.get('key'))
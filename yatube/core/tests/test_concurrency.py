@@ -0,0 +1,55 @@
+import threading
+
+from django.core.cache import cache
+from django.http import Http404
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, User
+
+from ..concurrency import gather
+
+
+@override_settings(QUERY_WORKERS=4)
+class GatherTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author')
+        self.reader = User.objects.create(username='reader')
+        self.post = Post.objects.create(text='Пост', author=self.author)
+
+    def test_calls_run_in_worker_threads(self):
+        results = gather(threading.get_ident, threading.get_ident,
+                         lambda: Post.objects.count())
+        self.assertNotIn(threading.get_ident(), results[:2])
+        self.assertEqual(results[2], 1)
+
+    def test_exception_is_raised(self):
+        def missing():
+            raise Http404
+
+        with self.assertRaises(Http404):
+            gather(missing, lambda: None)
+
+    @override_settings(QUERY_WORKERS=1)
+    def test_disabled_runs_inline(self):
+        self.assertEqual(gather(threading.get_ident, threading.get_ident),
+                         [threading.get_ident()] * 2)
+
+    def test_views_with_concurrent_queries(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(
+            reverse('posts:profile', args=[self.author.username]))
+        self.assertTrue(response.context['following'])
+        self.assertEqual(
+            list(response.context['page_obj'].object_list), [self.post])
+        response = client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        self.assertEqual(
+            list(response.context['comments'].object_list), [comment])
+        response = client.get(reverse('posts:profile', args=['nobody']))
+        self.assertEqual(response.status_code, 404)
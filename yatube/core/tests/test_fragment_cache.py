@@ -0,0 +1,89 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.template import Context, Template, TemplateSyntaxError
+from django.test import SimpleTestCase
+
+from ..profiling import fragments
+
+TEMPLATE = Template(
+    '{% load fragment_cache %}'
+    '{% cache 60 frag version %}{{ counter.next }}{% endcache %}'
+)
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def next(self):
+        self.value += 1
+        return self.value
+
+
+class FragmentCacheTagTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        fragments.reset()
+        self.counter = Counter()
+        self.key = make_template_fragment_key('frag', [1])
+
+    def render(self):
+        return TEMPLATE.render(
+            Context({'counter': self.counter, 'version': 1}))
+
+    def test_fragment_is_cached(self):
+        self.assertEqual(self.render(), '1')
+        self.assertEqual(self.render(), '1')
+        self.assertEqual(fragments.snapshot()['frag'],
+                         {'hits': 1, 'misses': 1, 'stale': 0})
+
+    def test_stale_fragment_is_served_while_rebuilding(self):
+        cache.set(self.key, ('old', time.time() - 1), 60)
+        cache.add(f'{self.key}.lock', 1)
+        self.assertEqual(self.render(), 'old')
+        self.assertEqual(self.counter.value, 0)
+        self.assertEqual(fragments.snapshot()['frag']['stale'], 1)
+
+    def test_stale_fragment_is_rebuilt_by_lock_owner(self):
+        cache.set(self.key, ('old', time.time() - 1), 60)
+        self.assertEqual(self.render(), '1')
+        self.assertEqual(self.render(), '1')
+
+    def test_new_version_serves_previous_copy_while_rebuilding(self):
+        template = Template(
+            '{% load fragment_cache %}'
+            '{% cache 60 frag version=version %}'
+            '{{ counter.next }}{% endcache %}'
+        )
+        key = make_template_fragment_key('frag', [])
+
+        def render(version):
+            return template.render(
+                Context({'counter': self.counter, 'version': version}))
+
+        self.assertEqual(render(1), '1')
+        self.assertEqual(render(1), '1')
+        cache.add(f'{key}.lock', 1)
+        self.assertEqual(render(2), '1')
+        self.assertEqual(fragments.snapshot()['frag']['stale'], 1)
+        cache.delete(f'{key}.lock')
+        self.assertEqual(render(2), '2')
+        self.assertEqual(render(2), '2')
+
+    @mock.patch('core.templatetags.fragment_cache.WAIT_TIMEOUT', 0)
+    def test_renders_without_cache_when_lock_is_stuck(self):
+        cache.add(f'{self.key}.lock', 1)
+        self.assertEqual(self.render(), '1')
+        self.assertIsNone(cache.get(self.key))
+
+    def test_syntax(self):
+        with self.assertRaises(TemplateSyntaxError):
+            Template('{% load fragment_cache %}{% cache 60 %}{% endcache %}')
+        with self.assertRaises(TemplateSyntaxError):
+            Template(
+                '{% load fragment_cache %}'
+                '{% cache 60 frag using="missing" %}{% endcache %}'
+            ).render(Context())
@@ -0,0 +1,137 @@
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+
+from posts.models import Post, User
+
+from ..media import parse_range
+
+CONTENT = b'0123456789'
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        cases = {
+            'bytes=2-5': (2, 5),
+            'bytes=7-': (7, 9),
+            'bytes=-3': (7, 9),
+            'bytes=-30': (0, 9),
+            'bytes=5-100': (5, 9),
+            'bytes=5-2': None,
+            'bytes=0-1,4-5': None,
+            'items=0-1': None,
+            'bytes=-': None,
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(parse_range(header, 10), expected)
+
+    def test_unsatisfiable(self):
+        for header in ('bytes=10-', 'bytes=-0'):
+            with self.subTest(header=header):
+                with self.assertRaises(ValueError):
+                    parse_range(header, 10)
+
+
+class MediaViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.name = default_storage.save(
+            'posts/image.gif', ContentFile(CONTENT))
+        Post.objects.create(text='Пост', author=self.user, image=self.name)
+        self.client = Client()
+
+    def get(self, name, **headers):
+        return self.client.get(reverse('media', args=[name]), **headers)
+
+    def test_referenced_image_is_served(self):
+        response = self.get(self.name)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_only_safe_methods(self):
+        self.assertEqual(self.client.head(
+            reverse('media', args=[self.name])).status_code, 200)
+        self.assertEqual(self.client.post(
+            reverse('media', args=[self.name])).status_code, 405)
+
+    def test_thumbnails_are_served(self):
+        name = default_storage.save('cache/ab/thumb.jpg', ContentFile(b'x'))
+        self.assertEqual(self.get(name).status_code, 200)
+
+    def test_hidden_files(self):
+        orphan = default_storage.save('posts/image.gif', ContentFile(b'x'))
+        for name in (orphan, 'posts/missing.gif', f'cache/../{orphan}',
+                     'cache/', 'settings.py'):
+            with self.subTest(name=name):
+                self.assertEqual(self.get(name).status_code, 404)
+
+    def test_range(self):
+        cases = {
+            'bytes=2-5': (206, b'2345', 'bytes 2-5/10'),
+            'bytes=-3': (206, b'789', 'bytes 7-9/10'),
+            'bytes=5-2': (200, CONTENT, None),
+        }
+        for header, (status, body, content_range) in cases.items():
+            with self.subTest(header=header):
+                response = self.get(self.name, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, status)
+                self.assertEqual(b''.join(response.streaming_content), body)
+                self.assertEqual(response['Content-Length'], str(len(body)))
+                self.assertEqual(response.get('Content-Range'),
+                                 content_range)
+
+    def test_unsatisfiable_range(self):
+        response = self.get(self.name, HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_stale_if_range_returns_whole_file(self):
+        response = self.get(self.name, HTTP_RANGE='bytes=2-5',
+                            HTTP_IF_RANGE=http_date(0))
+        self.assertEqual(response.status_code, 200)
+        last_modified = self.get(self.name)['Last-Modified']
+        response = self.get(self.name, HTTP_RANGE='bytes=2-5',
+                            HTTP_IF_RANGE=last_modified)
+        self.assertEqual(response.status_code, 206)
+
+    def test_not_modified(self):
+        last_modified = self.get(self.name)['Last-Modified']
+        response = self.get(self.name, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect',
+                       MEDIA_ACCEL_PREFIX='/protected/')
+    def test_x_accel_redirect(self):
+        response = self.get(self.name)
+        self.assertEqual(response['X-Accel-Redirect'],
+                         f'/protected/{self.name}')
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_SENDFILE='x-sendfile')
+    def test_x_sendfile(self):
+        response = self.get(self.name)
+        self.assertEqual(response['X-Sendfile'],
+                         default_storage.path(self.name))
+        self.assertEqual(response.content, b'')
+        response = self.get(f'cache/../{self.name}')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('X-Sendfile'))
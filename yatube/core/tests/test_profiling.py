@@ -0,0 +1,83 @@
+import re
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+
+from ..profiling import histogram
+
+
+def cache_misses(response):
+    return int(re.search(r'(\d+) misses', response['Server-Timing'])[1])
+
+
+@override_settings(PROFILING_SAMPLE_RATE=1.0)
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+        cls.admin = User.objects.create(username='admin', is_staff=True)
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        histogram.reset()
+        self.client = Client()
+
+    def test_server_timing_header(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for metric in ('total;dur=', 'sql;dur=', 'tpl;dur=', 'cache;desc='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, timing)
+
+    def test_server_timing_is_staff_only(self):
+        for user in (None, self.user):
+            with self.subTest(user=user):
+                if user:
+                    self.client.force_login(user)
+                response = self.client.get(reverse('posts:index'))
+                self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(histogram.snapshot()['posts:index']['count'], 2)
+
+    def test_cache_lookups_are_counted(self):
+        self.client.force_login(self.admin)
+        first = self.client.get(reverse('posts:index'))
+        second = self.client.get(reverse('posts:index'))
+        self.assertGreater(cache_misses(first), cache_misses(second))
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_unsampled_request_is_not_profiled(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(histogram.snapshot(), {})
+
+    def test_histogram_aggregates_by_view(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        data = histogram.snapshot()['posts:index']
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(sum(data['buckets'].values()), 2)
+        self.assertGreater(data['sql_count'], 0)
+        self.assertGreater(data['template_ms'], 0)
+
+    def test_dump_is_staff_only(self):
+        response = self.client.get(reverse('profiling'))
+        self.assertEqual(response.status_code, 302)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('profiling'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_dump_for_staff(self):
+        self.client.get(reverse('posts:index'))
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('profiling'), {'reset': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('posts:index', response.json()['views'])
+        self.assertIn('index_page', response.json()['fragments'])
+        self.assertNotIn('posts:index', histogram.snapshot())
@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Post, User
+from taskqueue.worker import run_pending
+
+from ..routers import PIN_COOKIE
+
+REPLICA = 'replica'
+
+
+class ReplicaFixtureMixin:
+    """Вторая база SQLite в файле, которую тест синхронизирует явно.
+
+    Копия снимается через backup API SQLite, который ждёт завершения
+    транзакций, поэтому нужен TransactionTestCase.
+    """
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        connections.databases[REPLICA] = dict(
+            connections.databases[DEFAULT_DB_ALIAS],
+            NAME=os.path.join(directory, 'replica.sqlite3'),
+        )
+        self.addCleanup(self.drop_replica)
+        settings = override_settings(REPLICA_DATABASES=[REPLICA])
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.sync_replica()
+
+    def sync_replica(self):
+        primary = connections[DEFAULT_DB_ALIAS]
+        replica = connections[REPLICA]
+        primary.ensure_connection()
+        replica.ensure_connection()
+        primary.connection.backup(replica.connection)
+
+    def drop_replica(self):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+
+
+class ReplicaRoutingTests(ReplicaFixtureMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create(username='author')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.sync_replica()
+
+    def index_posts(self, client):
+        response = client.get(reverse('posts:index'))
+        return list(response.context['page_obj'].object_list)
+
+    def test_feed_reads_from_replica(self):
+        post = Post.objects.create(text='Ещё не на реплике', author=self.user)
+        self.assertEqual(self.index_posts(Client()), [])
+        self.sync_replica()
+        response = Client().get(reverse('posts:index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+        self.assertContains(response, post.text)
+
+    @override_settings(REPLICA_PIN_SECONDS=0)
+    def test_settled_replica_reads_are_cached(self):
+        post = Post.objects.create(text='Уже на реплике', author=self.user)
+        self.sync_replica()
+        self.assertContains(Client().get(reverse('posts:index')), post.text)
+        Post.objects.filter(pk=post.pk).update(text='Без сигналов')
+        self.sync_replica()
+        self.assertContains(Client().get(reverse('posts:index')), post.text)
+
+    def test_writer_reads_own_writes(self):
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'})
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(
+            [post.text for post in self.index_posts(self.client)],
+            ['Новый пост'],
+        )
+        self.assertEqual(self.index_posts(Client()), [])
+
+    def test_writes_go_to_primary(self):
+        self.client.post(reverse('posts:post_create'), {'text': 'Пост'})
+        self.assertTrue(
+            Post.objects.using(DEFAULT_DB_ALIAS).filter(text='Пост').exists())
+        self.assertFalse(
+            Post.objects.using(REPLICA).filter(text='Пост').exists())
+
+    @mock.patch('posts.feed.FEED_FANOUT_LIMIT', 0)
+    def test_follow_feed_reads_pulled_entries(self):
+        author = User.objects.create(username='popular')
+        Follow.objects.create(user=self.user, author=author)
+        post = Post.objects.create(text='Пост популярного', author=author)
+        self.sync_replica()
+        self.client.get(reverse('posts:follow_index'))
+        run_pending()
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    def test_media_check_falls_back_to_primary(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media):
+            name = default_storage.save('posts/image.gif', ContentFile(b'x'))
+            Post.objects.create(text='Пост', author=self.user, image=name)
+            response = Client().get(reverse('media', args=[name]))
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+
+from ..storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        self.storage = ContentAddressedStorage(location=self.location)
+
+    def test_name_depends_on_content(self):
+        first = self.storage.save('posts/a.JPG', ContentFile(b'one'))
+        same = self.storage.save('posts/b.jpg', ContentFile(b'one'))
+        other = self.storage.save('posts/a.jpg', ContentFile(b'two'))
+        self.assertEqual(first, same)
+        self.assertNotEqual(first, other)
+        directory, filename = os.path.split(first)
+        self.assertEqual(directory, f'posts/{filename[:2]}/{filename[2:4]}')
+        self.assertTrue(filename.endswith('.jpg'))
+        with self.storage.open(first) as stored:
+            self.assertEqual(stored.read(), b'one')
+
+    def test_duplicate_is_written_once_and_touched(self):
+        name = self.storage.save('posts/a.jpg', ContentFile(b'one'))
+        os.utime(self.storage.path(name), (0, 0))
+        self.storage.save('posts/a.jpg', ContentFile(b'one'))
+        self.assertGreater(os.path.getmtime(self.storage.path(name)), 0)
+        files = [name for _, _, files in os.walk(self.location)
+                 for name in files]
+        self.assertEqual(len(files), 1)
+
+    def test_delete_if_stale(self):
+        name = self.storage.save('posts/a.jpg', ContentFile(b'one'))
+        self.assertFalse(self.storage.delete_if_stale(name, time.time() - 60))
+        self.assertTrue(self.storage.exists(name))
+        os.utime(self.storage.path(name), (0, 0))
+        self.assertTrue(self.storage.delete_if_stale(name, time.time() - 60))
+        self.assertEqual(os.listdir(os.path.dirname(self.storage.path(name))),
+                         [])
+
+    def test_save_while_deleting_keeps_file(self):
+        name = self.storage.save('posts/a.jpg', ContentFile(b'one'))
+        os.utime(self.storage.path(name), (0, 0))
+        replace = os.replace
+
+        def save_after_move(source, target):
+            replace(source, target)
+            patcher.stop()
+            self.storage.save('posts/b.jpg', ContentFile(b'one'))
+
+        patcher = mock.patch('core.storage.os.replace', save_after_move)
+        patcher.start()
+        self.assertTrue(self.storage.delete_if_stale(name, time.time() - 60))
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'one')
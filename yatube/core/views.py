@@ -1,4 +1,20 @@
+import os
+import posixpath
+import stat
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponseNotModified, JsonResponse
 from django.shortcuts import render
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.utils.module_loading import import_string
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+from . import media as files
+from .profiling import fragments, histogram
+from .routers import is_reading_from_replica, reading_from_primary, use_replica
 
 
 def page_not_found(request, exception):
@@ -12,3 +28,53 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def profiling_stats(request):
+    """Накопленные метрики профайлера; ?reset=1 обнуляет их."""
+    snapshot = {
+        'views': histogram.snapshot(),
+        'fragments': fragments.snapshot(),
+    }
+    if request.GET.get('reset'):
+        histogram.reset()
+        fragments.reset()
+    return JsonResponse(snapshot, json_dumps_params={'ensure_ascii': False})
+
+
+@require_safe
+@use_replica
+def media(request, name):
+    """Медиафайл, если MEDIA_ACCESS_CHECK разрешает его отдать.
+
+    С MEDIA_SENDFILE байты передаёт фронтовой сервер, Django только
+    проверяет доступ.
+    """
+    if posixpath.normpath(name) != name:
+        raise Http404
+    check = import_string(settings.MEDIA_ACCESS_CHECK)
+    allowed = check(request, name)
+    if not allowed and is_reading_from_replica():
+        # Пост с только что загруженной картинкой может ещё не дойти
+        # до реплики.
+        with reading_from_primary():
+            allowed = check(request, name)
+    if not allowed:
+        raise Http404
+    path = safe_join(settings.MEDIA_ROOT, name)
+    try:
+        info = os.stat(path)
+    except OSError:
+        raise Http404
+    if not stat.S_ISREG(info.st_mode):
+        raise Http404
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'),
+                              info.st_mtime, info.st_size):
+        return HttpResponseNotModified()
+    if settings.MEDIA_SENDFILE:
+        response = files.sendfile(name, path)
+    else:
+        response = files.file_response(request, path, info)
+    response['Last-Modified'] = http_date(info.st_mtime)
+    return response
@@ -1,17 +1,34 @@
 from django.contrib import admin
 
 from .models import Comment, Follow, Group, Post
+from .search import is_supported, match_expression, matching_ids
+from .utils import EstimatedCountPaginator
 
 
 class PostAdmin(admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
     list_editable = ('group',)
+    autocomplete_fields = ('author', 'group')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not match_expression(search_term) or not is_supported():
+            return super().get_search_results(
+                request, queryset, search_term)
+        return queryset.filter(pk__in=matching_ids(search_term)), False
+
+
+class GroupAdmin(admin.ModelAdmin):
+    search_fields = ('title', 'slug')
+
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
+admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment)
 admin.site.register(Follow)
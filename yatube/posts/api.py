@@ -0,0 +1,135 @@
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_safe
+
+from .caching import conditional_response, feed_version, make_etag
+from .constants import NUMBER_OF_POSTS
+from .feed import attach_posts, timeline
+from .models import Group, Post, User
+from .utils import CursorPaginator, comments_page
+
+
+def serialize_author(user):
+    return {
+        'username': user.username,
+        'full_name': user.get_full_name(),
+    }
+
+
+def serialize_post(post):
+    group = post.group
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': serialize_author(post.author),
+        'group': group and {'slug': group.slug, 'title': group.title},
+        'image': post.image.url if post.image else None,
+        'comment_count': post.comment_count,
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.pk,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+        'author': serialize_author(comment.author),
+    }
+
+
+def serialize_page(page, serialize=serialize_post):
+    return {
+        'results': [serialize(item) for item in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+
+
+def feed_response(request, scope, posts, *extra):
+    """Страница ленты по курсору с ETag от самого свежего поста области."""
+    last_modified = posts.aggregate(Max('pub_date'))['pub_date__max']
+    etag = make_etag(scope, request.get_full_path(), last_modified,
+                     feed_version(), *extra)
+
+    def build():
+        page = CursorPaginator(posts, NUMBER_OF_POSTS).get_page(
+            request.GET.get('cursor'))
+        return JsonResponse(serialize_page(page))
+
+    return conditional_response(request, etag, build)
+
+
+@require_safe
+def index(request):
+    return feed_response(request, 'index', Post.objects.for_feed())
+
+
+@require_safe
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(
+        request, 'group', Post.objects.for_feed().filter(group=group))
+
+
+@require_safe
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(
+        request, 'profile', Post.objects.for_feed().filter(author=author))
+
+
+@require_safe
+def post_detail(request, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id)
+    latest = post.comments.aggregate(Max('created'))['created__max']
+    last_modified = max(filter(None, (post.pub_date, latest)))
+    etag = make_etag('post', post.pk, last_modified, feed_version())
+
+    def build():
+        data = serialize_post(post)
+        page = comments_page(post.pk)
+        data['comments'] = [serialize_comment(item) for item in page]
+        data['comments_next'] = page.next_cursor
+        return JsonResponse(data)
+
+    return conditional_response(request, etag, build)
+
+
+@require_safe
+def comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    last_modified = post.comments.aggregate(
+        Max('created'))['created__max']
+    etag = make_etag('comments', post.pk, request.get_full_path(),
+                     last_modified, feed_version())
+
+    def build():
+        page = comments_page(post.pk, request.GET.get('cursor'))
+        return JsonResponse(serialize_page(page, serialize_comment))
+
+    return conditional_response(request, etag, build)
+
+
+@require_safe
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return JsonResponse(
+            {'detail': 'Требуется авторизация.'}, status=401)
+    entries = timeline(request.user)
+    meta = entries.aggregate(Max('pub_date'), Count('pk'))
+    last_modified = meta['pub_date__max']
+    etag = make_etag('follow', request.user.pk, request.get_full_path(),
+                     last_modified, meta['pk__count'], feed_version())
+
+    def build():
+        page = attach_posts(CursorPaginator(
+            entries, NUMBER_OF_POSTS).get_page(request.GET.get('cursor')))
+        return JsonResponse(serialize_page(page))
+
+    response = conditional_response(request, etag, build)
+    patch_cache_control(response, private=True)
+    return response
@@ -0,0 +1,244 @@
+import math
+import random
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import Client, RequestFactory, override_settings
+from django.urls import reverse
+from django.views import static
+from faker import Faker
+
+from core.views import media
+
+from . import counters, feed, trending
+from .models import Comment, Follow, Group, Post, User
+
+# SQLite ограничивает число строк в одном INSERT ... SELECT UNION.
+BATCH_SIZE = 250
+# Сценарии, которые выполняются от имени суперпользователя.
+ADMIN_SCENARIOS = ('admin_posts',)
+# Размер запрошенного куска в сценарии media_range.
+MEDIA_RANGE = 2 ** 20
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def seed(users=100, groups=10, posts=10000, comments=20000, follows=20,
+         seed_value=0):
+    """Заполняет базу синтетическими данными пакетными вставками."""
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed_value)
+    rng = random.Random(seed_value)
+    User.objects.bulk_create(
+        [User(username=f'bench{i}', first_name=fake.first_name(),
+              last_name=fake.last_name()) for i in range(users)],
+        batch_size=BATCH_SIZE,
+    )
+    user_ids = list(User.objects.filter(
+        username__startswith='bench').values_list('pk', flat=True))
+    Group.objects.bulk_create(
+        [Group(title=fake.sentence(nb_words=3), slug=f'bench-{i}',
+               description=fake.text()) for i in range(groups)],
+        batch_size=BATCH_SIZE,
+    )
+    group_ids = list(Group.objects.filter(
+        slug__startswith='bench-').values_list('pk', flat=True))
+    for start in range(0, posts, BATCH_SIZE):
+        Post.objects.bulk_create([
+            Post(
+                text=fake.text(max_nb_chars=400),
+                author_id=rng.choice(user_ids),
+                group_id=rng.choice(group_ids + [None]),
+            )
+            for _ in range(min(BATCH_SIZE, posts - start))
+        ])
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    for start in range(0, comments, BATCH_SIZE):
+        Comment.objects.bulk_create([
+            Comment(
+                text=fake.sentence(),
+                post_id=rng.choice(post_ids),
+                author_id=rng.choice(user_ids),
+            )
+            for _ in range(min(BATCH_SIZE, comments - start))
+        ])
+    pairs = {
+        (user_id, author_id)
+        for user_id in user_ids
+        for author_id in rng.sample(user_ids, min(follows, len(user_ids)))
+        if user_id != author_id
+    }
+    Follow.objects.bulk_create(
+        [Follow(user_id=user_id, author_id=author_id)
+         for user_id, author_id in pairs],
+        batch_size=BATCH_SIZE,
+    )
+    counters.reconcile()
+    feed.rebuild()
+    trending.rebuild()
+    return {
+        'users': users,
+        'groups': groups,
+        'posts': posts,
+        'comments': comments,
+        'follows': len(pairs),
+    }
+
+
+class QueryCounter:
+    """Считает SQL-запросы без накладных расходов CaptureQueriesContext."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def scenarios(rng):
+    """Именованные запросы к страницам: (имя, метод, функция url, данные)."""
+    post_ids = list(Post.objects.values_list('pk', flat=True)[:1000])
+    slugs = list(Group.objects.values_list('slug', flat=True))
+    usernames = list(User.objects.filter(
+        posts__isnull=False).values_list('username', flat=True).distinct())
+    return [
+        ('index', 'get', lambda: reverse('posts:index') + (
+            f'?page={rng.randint(1, 20)}'), None),
+        ('group_posts', 'get', lambda: reverse(
+            'posts:group_list', args=[rng.choice(slugs)]), None),
+        ('profile', 'get', lambda: reverse(
+            'posts:profile', args=[rng.choice(usernames)]), None),
+        ('post_detail', 'get', lambda: reverse(
+            'posts:post_detail', args=[rng.choice(post_ids)]), None),
+        ('follow_index', 'get', lambda: reverse('posts:follow_index'), None),
+        ('trending', 'get', lambda: reverse('posts:trending'), None),
+        ('post_create', 'post', lambda: reverse('posts:post_create'),
+         {'text': 'Пост из бенчмарка'}),
+        ('add_comment', 'post', lambda: reverse(
+            'posts:add_comment', args=[rng.choice(post_ids)]),
+         {'text': 'Комментарий из бенчмарка'}),
+        ('admin_posts', 'get', lambda: reverse(
+            'admin:posts_post_changelist') + (
+            f'?p={rng.randint(0, 9)}'), None),
+    ]
+
+
+def run(requests=200, seed_value=0, only=None):
+    """Гоняет сценарии через тестовый клиент и собирает метрики."""
+    rng = random.Random(seed_value)
+    user = User.objects.filter(
+        follower__isnull=False).order_by('pk').first()
+    client = Client()
+    client.force_login(user)
+    admin_client = Client()
+    admin_client.force_login(User.objects.get_or_create(
+        username='bench-admin',
+        defaults={'is_staff': True, 'is_superuser': True},
+    )[0])
+    cache.clear()
+    results = {}
+    for name, method, url, data in scenarios(rng):
+        if only and name not in only:
+            continue
+        timings = []
+        queries = []
+        started = time.perf_counter()
+        for _ in range(requests):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                begin = time.perf_counter()
+                getattr(admin_client if name in ADMIN_SCENARIOS else client,
+                        method)(url(), data)
+                timings.append(time.perf_counter() - begin)
+            queries.append(counter.count)
+        elapsed = time.perf_counter() - started
+        results[name] = {
+            'requests': requests,
+            'rps': round(requests / elapsed, 1),
+            'p50_ms': round(percentile(timings, 50) * 1000, 2),
+            'p95_ms': round(percentile(timings, 95) * 1000, 2),
+            'p99_ms': round(percentile(timings, 99) * 1000, 2),
+            'queries_avg': round(sum(queries) / len(queries), 1),
+            'queries_max': max(queries),
+        }
+    return results
+
+
+def media_scenarios(rng, name, size):
+    """Способы отдать файл: (имя, настройки, заголовки запроса, view)."""
+    def serve_static(request):
+        return static.serve(request, name, settings.MEDIA_ROOT)
+
+    def serve_media(request):
+        return media(request, name)
+
+    def random_range():
+        start = rng.randrange(max(size - MEDIA_RANGE, 1))
+        return {'HTTP_RANGE': f'bytes={start}-{start + MEDIA_RANGE - 1}'}
+
+    return [
+        ('static_serve', {}, dict, serve_static),
+        ('file_response', {'MEDIA_SENDFILE': ''}, dict, serve_media),
+        ('file_range', {'MEDIA_SENDFILE': ''}, random_range, serve_media),
+        ('x_accel', {'MEDIA_SENDFILE': 'x-accel-redirect'}, dict,
+         serve_media),
+    ]
+
+
+def run_media(requests=200, size=8 * 2 ** 20, seed_value=0):
+    """Сравнивает отдачу медиафайла: старый static.serve из DEBUG,
+    FileResponse и передачу файла фронтовому серверу.
+
+    Тело ответа вычитывается целиком, поэтому mb_s — сколько байт
+    в секунду прошло через Python. С X-Accel-Redirect их ноль: файл
+    отдаёт nginx.
+    """
+    rng = random.Random(seed_value)
+    root = tempfile.mkdtemp()
+    try:
+        with override_settings(MEDIA_ROOT=root):
+            name = default_storage.save('posts/bench.jpg', ContentFile(
+                rng.getrandbits(8 * size).to_bytes(size, 'little')))
+            user = User.objects.get_or_create(username='bench-media')[0]
+            Post.objects.create(text='Картинка', author=user, image=name)
+            factory = RequestFactory()
+            results = {}
+            for title, options, headers, view in media_scenarios(
+                    rng, name, size):
+                timings = []
+                transferred = 0
+                with override_settings(**options):
+                    started = time.perf_counter()
+                    for _ in range(requests):
+                        request = factory.get('/', **headers())
+                        request.user = AnonymousUser()
+                        begin = time.perf_counter()
+                        response = view(request)
+                        for chunk in response:
+                            transferred += len(chunk)
+                        response.close()
+                        timings.append(time.perf_counter() - begin)
+                    elapsed = time.perf_counter() - started
+                results[title] = {
+                    'requests': requests,
+                    'rps': round(requests / elapsed, 1),
+                    'mb_s': round(transferred / 2 ** 20 / elapsed, 1),
+                    'p50_ms': round(percentile(timings, 50) * 1000, 2),
+                    'p95_ms': round(percentile(timings, 95) * 1000, 2),
+                }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return results
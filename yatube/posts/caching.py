@@ -0,0 +1,118 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.translation import get_language
+
+from core.routers import is_reading_from_replica, replica_may_lag
+
+from .constants import PUBLIC_CACHE_TIMEOUT
+
+FEED_VERSION_KEY = 'posts:feed_version'
+GROUPS_VERSION_KEY = 'posts:groups_version'
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def feed_version():
+    """Текущая версия ленты: входит в ключи закэшированных фрагментов.
+
+    Значение — время создания версии в наносекундах.
+    """
+    return _version(FEED_VERSION_KEY)
+
+
+def bump_feed_version():
+    """Инвалидирует все закэшированные страницы ленты разом.
+
+    Новую версию создаст первый читатель, так что её значение не раньше
+    записи.
+    """
+    cache.delete(FEED_VERSION_KEY)
+
+
+def groups_version():
+    """Версия списка групп: меняют только посты и группы, не комментарии."""
+    return _version(GROUPS_VERSION_KEY)
+
+
+def bump_groups_version():
+    cache.delete(GROUPS_VERSION_KEY)
+
+
+def replicas_settled(version):
+    """Успели ли реплики догнать запись, после которой создана версия.
+
+    Реплика отстаёт не больше REPLICA_PIN_SECONDS; до этого прочитанное
+    с неё нельзя кэшировать под новой версией.
+    """
+    return time.time_ns() - version >= settings.REPLICA_PIN_SECONDS * 10 ** 9
+
+
+def make_etag(*parts):
+    """Сильный ETag по метаданным области, без рендера ответа."""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def conditional_response(request, etag, build):
+    """Отвечает 304 по If-None-Match или строит ответ.
+
+    Last-Modified не отправляем: время последней публикации не меняется
+    при правке и удалении постов, а ETag включает версию ленты.
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = build()
+    if request.method in ('GET', 'HEAD'):
+        response['ETag'] = etag
+    return response
+
+
+def conditional_render(request, template_name, get_context, scope,
+                       last_modified):
+    """Страница ленты с ETag и заголовками кэширования.
+
+    Анонимам страница одинакова, поэтому их ответ публичный: его может
+    хранить прокси, а в Django он кэшируется целиком по ETag. Страницы
+    пользователей приватные и всегда перепроверяются. Пока реплики могут
+    отставать от последней записи, прочитанное с них в кэш не кладём.
+    """
+    user = request.user
+    anonymous = not user.is_authenticated
+    version = feed_version()
+    etag = make_etag(*scope, request.get_full_path(), last_modified,
+                     version, user.pk, get_language())
+    key = f'posts:page:{etag}'
+    lagging = (settings.REPLICA_DATABASES and is_reading_from_replica()
+               and not replicas_settled(version))
+
+    def page():
+        return render(request, template_name, get_context())
+
+    def build():
+        if lagging:
+            with replica_may_lag():
+                return (anonymous and cache.get(key)) or page()
+        if not anonymous:
+            return page()
+        return cache.get_or_set(key, page, PUBLIC_CACHE_TIMEOUT)
+
+    response = conditional_response(request, etag, build)
+    if anonymous:
+        patch_cache_control(response, public=True,
+                            max_age=PUBLIC_CACHE_TIMEOUT)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
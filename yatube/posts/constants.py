@@ -1 +1,19 @@
 NUMBER_OF_POSTS = 10
+COMMENTS_PER_PAGE = 20
+FEED_FANOUT_LIMIT = 1000
+FEED_BATCH_SIZE = 500
+# Рассылки больше этого числа строк уходят в очередь фоновых задач.
+FEED_ASYNC_THRESHOLD = 200
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+PUBLIC_CACHE_TIMEOUT = 60
+TRENDING_POSTS = 20
+# Через сколько секунд вклад комментария в рейтинг падает вдвое.
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_FOLLOWER_WEIGHT = 0.5
+# Посты старше этого срока при смене числа подписчиков не пересчитываются.
+TRENDING_REWEIGH_WINDOW = 2 * 24 * 60 * 60
+# До скольких строк админка считает их точным COUNT(*).
+EXACT_COUNT_LIMIT = 10000
+THUMBNAIL_SIZES = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
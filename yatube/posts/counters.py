@@ -0,0 +1,56 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuthorStats, Comment, Follow, Post, User
+
+
+def _increment(queryset, **deltas):
+    return queryset.update(**{
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    })
+
+
+def stats_for(user):
+    """Счётчики пользователя; пустые, если строку ещё не создали."""
+    return getattr(user, 'stats', None) or AuthorStats(user=user)
+
+
+def bump_author(user_id, **deltas):
+    """Меняет счётчики пользователя одним UPDATE с F()-выражениями."""
+    updated = _increment(AuthorStats.objects.filter(user_id=user_id),
+                         **deltas)
+    if not updated and all(delta > 0 for delta in deltas.values()):
+        AuthorStats.objects.get_or_create(user_id=user_id, defaults=deltas)
+
+
+def bump_comments(post_id, delta):
+    _increment(Post.objects.filter(pk=post_id), comment_count=delta)
+
+
+def _count(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(count=Count('pk')).values('count'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def reconcile():
+    """Пересчитывает все счётчики пакетными UPDATE; возвращает число строк."""
+    AuthorStats.objects.bulk_create(
+        [
+            AuthorStats(user_id=user_id)
+            for user_id in User.objects.filter(
+                stats__isnull=True).values_list('pk', flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+    posts = Post.objects.update(
+        comment_count=_count(Comment.objects, 'post'))
+    stats = AuthorStats.objects.update(
+        post_count=_count(Post.objects, 'author'),
+        follower_count=_count(Follow.objects, 'author'),
+        following_count=_count(Follow.objects, 'user'),
+    )
+    return posts, stats
@@ -0,0 +1,158 @@
+from django.db import connection
+from django.db.models import Max, Q
+
+from taskqueue.registry import enqueue
+
+from .constants import (FEED_ASYNC_THRESHOLD, FEED_BATCH_SIZE,
+                        FEED_FANOUT_LIMIT)
+from .models import AuthorStats, FeedEntry, Follow, Post
+
+
+def _entries(posts, user_ids):
+    return [
+        FeedEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for post in posts
+        for user_id in user_ids
+    ]
+
+
+def _store(entries):
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=FEED_BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def _stats(author_id):
+    return AuthorStats.objects.filter(user_id=author_id).values(
+        'post_count', 'follower_count').first() or {
+            'post_count': 0, 'follower_count': 0}
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты подписчиков автора.
+
+    Посты авторов с огромным числом подписчиков не рассылаются при записи,
+    большие рассылки уходят в очередь задач.
+    """
+    followers = _stats(post.author_id)['follower_count']
+    if followers > FEED_FANOUT_LIMIT:
+        return
+    if followers > FEED_ASYNC_THRESHOLD:
+        enqueue('posts.tasks.deliver_post', post.pk,
+                key=f'feed:deliver:{post.pk}')
+        return
+    deliver(post)
+
+
+def deliver(post):
+    followers = list(Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True))
+    _store(_entries([post], followers))
+
+
+def backfill(follow):
+    """Переносит уже опубликованные посты автора в ленту нового подписчика."""
+    if _stats(follow.author_id)['post_count'] > FEED_ASYNC_THRESHOLD:
+        enqueue('posts.tasks.backfill_follow', follow.pk,
+                key=f'feed:backfill:{follow.pk}')
+        return
+    copy_posts(follow)
+
+
+def copy_posts(follow):
+    posts = Post.objects.filter(author_id=follow.author_id).only(
+        'pk', 'author_id', 'pub_date')
+    _store(_entries(posts.iterator(), [follow.user_id]))
+
+
+def trim(follow):
+    """Убирает посты автора из ленты отписавшегося пользователя."""
+    FeedEntry.objects.filter(
+        user_id=follow.user_id, author_id=follow.author_id).delete()
+
+
+def _unpulled(user_id):
+    """Посты популярных авторов, которых ещё нет в ленте пользователя.
+
+    Граница своя у каждого автора: новый пост одного автора не должен
+    скрывать ещё не подтянутые посты другого.
+    """
+    popular = list(Follow.objects.filter(
+        user_id=user_id, author__stats__follower_count__gt=FEED_FANOUT_LIMIT
+    ).values_list('author', flat=True))
+    if not popular:
+        return Post.objects.none()
+    latest = dict(FeedEntry.objects.filter(
+        user_id=user_id, author__in=popular,
+    ).order_by().values('author').annotate(
+        latest=Max('pub_date')).values_list('author', 'latest'))
+    condition = Q()
+    for author in popular:
+        if author in latest:
+            condition |= Q(author=author, pub_date__gt=latest[author])
+        else:
+            condition |= Q(author=author)
+    return Post.objects.filter(condition)
+
+
+def schedule_pull(user):
+    """Fan-out при чтении: ставит в очередь подтягивание свежих постов.
+
+    Запрос на чтение сам ленту не пишет. Ключ задачи включает новейший
+    недостающий пост, поэтому повторные чтения до работы воркера ничего
+    не добавляют, а новый пост ставит новую задачу.
+    """
+    newest = _unpulled(user.pk).aggregate(Max('pk'))['pk__max']
+    if newest is not None:
+        enqueue('posts.tasks.pull_popular', user.pk,
+                key=f'feed:pull:{user.pk}:{newest}')
+
+
+def pull_popular(user_id):
+    posts = _unpulled(user_id).only('pk', 'author_id', 'pub_date')
+    _store(_entries(posts.iterator(), [user_id]))
+
+
+def attach_posts(page):
+    """Подменяет записи ленты на странице постами одним запросом."""
+    posts = Post.objects.for_feed().in_bulk(
+        [entry.post_id for entry in page]
+    )
+    page.object_list = [
+        posts[entry.post_id] for entry in page if entry.post_id in posts
+    ]
+    return page
+
+
+def timeline(user):
+    """Лента подписок пользователя в виде записей FeedEntry."""
+    schedule_pull(user)
+    return FeedEntry.objects.filter(user=user).order_by('-pub_date', '-pk')
+
+
+def rebuild():
+    """Досоздаёт записи лент одним INSERT ... SELECT — после bulk-загрузок.
+
+    Посты популярных авторов пропускаются: их подтянет pull_popular.
+    """
+    feed = FeedEntry._meta.db_table
+    post = Post._meta.db_table
+    follow = Follow._meta.db_table
+    stats = AuthorStats._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {feed} (user_id, post_id, author_id, pub_date) '
+            f'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+            f'FROM {follow} f '
+            f'INNER JOIN {post} p ON p.author_id = f.author_id '
+            f'LEFT JOIN {stats} s ON s.user_id = f.author_id '
+            f'WHERE COALESCE(s.follower_count, 0) <= %s '
+            f'ON CONFLICT DO NOTHING',
+            [FEED_FANOUT_LIMIT]
+        )
+        return cursor.rowcount
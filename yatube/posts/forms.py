@@ -1,4 +1,6 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
 
 from .models import Comment, Post
 
@@ -13,6 +15,23 @@ class PostForm(forms.ModelForm):
             'group': 'Группа, к которой будет относиться пост',
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        if image.size > settings.IMAGE_MAX_UPLOAD_SIZE:
+            raise forms.ValidationError(
+                'Файл больше %(size)d МБ.',
+                params={'size': settings.IMAGE_MAX_UPLOAD_SIZE // 2 ** 20},
+            )
+        width, height = image.image.size
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            raise forms.ValidationError(
+                'Картинка больше %(pixels)d мегапикселей.',
+                params={'pixels': settings.IMAGE_MAX_PIXELS // 10 ** 6},
+            )
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
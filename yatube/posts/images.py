@@ -0,0 +1,183 @@
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+from sorl.thumbnail import delete as delete_with_thumbnails
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from taskqueue.registry import enqueue as enqueue_task
+
+from . import thumbnails
+from .caching import bump_feed_version
+from .models import ImageBlob, Post
+
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+
+
+def output_format():
+    """Формат из IMAGE_FORMAT; без поддержки WebP в Pillow — JPEG."""
+    fmt = settings.IMAGE_FORMAT.upper()
+    if fmt == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return fmt
+
+
+def encode(source):
+    """Уменьшает картинку, убирает EXIF и перекодирует её.
+
+    Возвращает None, если файл лучше оставить как есть: анимацию или
+    картинку, которая уже в нужном формате, размере и без метаданных.
+    """
+    image = Image.open(source)
+    fmt = output_format()
+    limit = (settings.IMAGE_MAX_DIMENSION, settings.IMAGE_MAX_DIMENSION)
+    if getattr(image, 'is_animated', False) or (
+            image.format == fmt and max(image.size) <= limit[0]
+            and 'exif' not in image.info):
+        return None
+    # JPEG сразу декодируется в уменьшенном масштабе.
+    image.draft('RGB', limit)
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(limit, Image.LANCZOS)
+    if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode not in ('RGB', 'RGBA', 'L'):
+        image = image.convert('RGBA')
+    options = {'quality': settings.IMAGE_QUALITY}
+    if fmt == 'JPEG':
+        options.update(optimize=True, progressive=True)
+    else:
+        options.update(method=6)
+    buffer = BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def process(name):
+    """Обрабатывает загруженный файл и переводит на результат все посты.
+
+    Хранилище адресует файлы по содержимому, поэтому одинаковые
+    результаты не дублируются; ставший ненужным оригинал удалит collect().
+    """
+    if not default_storage.exists(name):
+        return None
+    with default_storage.open(name) as source:
+        data = encode(source)
+    target = name
+    if data is not None:
+        target = default_storage.save(
+            f'posts/image.{EXTENSIONS[output_format()]}', ContentFile(data))
+    if target != name:
+        moved = Post.objects.filter(image=name).update(image=target)
+        retain(target, moved)
+        release(name, moved)
+        transaction.on_commit(bump_feed_version)
+    thumbnails.enqueue_name(target)
+    return target
+
+
+def enqueue(post):
+    """Ставит новую картинку поста в обработку."""
+    if post.image:
+        enqueue_task('posts.tasks.process_image', post.image.name,
+                     key=f'image:{post.pk}:{post.image.name}')
+
+
+def is_public(request, name):
+    """Картинку отдаём, пока на неё ссылается пост; миниатюры — всегда."""
+    if name.startswith(thumbnail_settings.THUMBNAIL_PREFIX):
+        return True
+    return (name.startswith('posts/')
+            and Post.objects.filter(image=name).exists())
+
+
+def retain(name, count=1):
+    if not name or not count:
+        return
+    updated = ImageBlob.objects.filter(name=name).update(
+        ref_count=F('ref_count') + count)
+    if not updated:
+        ImageBlob.objects.get_or_create(
+            name=name, defaults={'ref_count': count})
+
+
+def release(name, count=1):
+    if name and count:
+        ImageBlob.objects.filter(name=name).update(
+            ref_count=Greatest(F('ref_count') - count, 0))
+
+
+def reconcile():
+    """Пересчитывает ссылки на файлы по постам; возвращает число файлов."""
+    referenced = Post.objects.exclude(image='').exclude(
+        image__in=ImageBlob.objects.values('name'),
+    ).order_by().values_list('image', flat=True).distinct()
+    ImageBlob.objects.bulk_create(
+        [ImageBlob(name=name) for name in referenced],
+        ignore_conflicts=True,
+    )
+    return ImageBlob.objects.update(ref_count=Coalesce(Subquery(
+        Post.objects.filter(image=OuterRef('name')).order_by().values(
+            'image').annotate(count=Count('pk')).values('count'),
+        output_field=IntegerField(),
+    ), 0))
+
+
+def _files(path):
+    directories, files = default_storage.listdir(path)
+    for name in files:
+        yield f'{path}/{name}'
+    for directory in directories:
+        yield from _files(f'{path}/{directory}')
+
+
+def _is_fresh(name, cutoff):
+    try:
+        return default_storage.get_modified_time(name) >= cutoff
+    except FileNotFoundError:
+        return False
+
+
+def collect(grace, dry_run=False):
+    """Удаляет файлы картинок без ссылок вместе с их миниатюрами.
+
+    Файлы, изменённые меньше grace секунд назад, не трогаем: пост,
+    который на них сошлётся, может быть ещё не сохранён. Это же
+    проверяется ещё раз в момент удаления файла, после удаления строки
+    ImageBlob: иначе загрузка того же содержимого в этом промежутке
+    осталась бы без файла. Нужно хранилище ContentAddressedStorage.
+    Возвращает удалённые имена.
+    """
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    known = set(ImageBlob.objects.values_list('name', flat=True))
+    candidates = list(ImageBlob.objects.filter(
+        ref_count=0, created__lt=cutoff).values_list('name', flat=True))
+    if default_storage.exists('posts'):
+        candidates += [name for name in _files('posts')
+                       if name not in known]
+    removed = []
+    for name in candidates:
+        if _is_fresh(name, cutoff):
+            continue
+        if not dry_run:
+            if name in known and not ImageBlob.objects.filter(
+                    name=name, ref_count=0).delete()[0]:
+                continue
+            if not default_storage.delete_if_stale(
+                    name, cutoff.timestamp()):
+                continue
+            delete_with_thumbnails(
+                ImageFile(name, default_storage), delete_file=False)
+        removed.append(name)
+    return removed
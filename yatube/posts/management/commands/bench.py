@@ -0,0 +1,118 @@
+import json
+import subprocess
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts import benchmark
+
+COLUMNS = ('rps', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_avg')
+MEDIA_COLUMNS = ('rps', 'mb_s', 'p50_ms', 'p95_ms')
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный бенчмарк страниц на синтетических данных '
+        'во временной тестовой базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=40000)
+        parser.add_argument('--follows', type=int, default=20)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--views', nargs='*',
+            help='Только перечисленные сценарии (index, profile, ...).',
+        )
+        parser.add_argument(
+            '--media', action='store_true',
+            help='Вместо страниц сравнить способы отдачи медиафайла.',
+        )
+        parser.add_argument(
+            '--media-size', type=int, default=8,
+            help='Размер файла для --media в мегабайтах.',
+        )
+        parser.add_argument('--output', help='Куда сохранить JSON.')
+        parser.add_argument(
+            '--compare', help='JSON прошлого прогона для сравнения.')
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            if options['media']:
+                dataset = {'media_size_mb': options['media_size']}
+                views = benchmark.run_media(
+                    requests=options['requests'],
+                    size=options['media_size'] * 2 ** 20,
+                    seed_value=options['seed'],
+                )
+            else:
+                dataset, views = self.run_pages(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        report = {
+            'commit': current_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'dataset': dataset,
+            'views': views,
+        }
+        previous = None
+        if options['compare']:
+            with open(options['compare']) as file:
+                previous = json.load(file)['views']
+        self.print_table(
+            views, previous,
+            MEDIA_COLUMNS if options['media'] else COLUMNS)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2, ensure_ascii=False)
+
+    def run_pages(self, options):
+        started = time.perf_counter()
+        dataset = benchmark.seed(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            seed_value=options['seed'],
+        )
+        self.stdout.write(
+            f'Данные созданы за {time.perf_counter() - started:.1f} с: '
+            f'{dataset}'
+        )
+        views = benchmark.run(
+            requests=options['requests'],
+            seed_value=options['seed'],
+            only=options['views'],
+        )
+        return dataset, views
+
+    def print_table(self, views, previous, columns=COLUMNS):
+        self.stdout.write('{:<14}'.format('view') + ''.join(
+            f'{column:>14}' for column in columns))
+        for name, metrics in views.items():
+            cells = []
+            for column in columns:
+                cell = f'{metrics[column]}'
+                if previous and name in previous:
+                    delta = metrics[column] - previous[name][column]
+                    cell += f' ({delta:+.1f})'
+                cells.append(f'{cell:>14}')
+            self.stdout.write(f'{name:<14}' + ''.join(cells))
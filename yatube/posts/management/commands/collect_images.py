@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from core.storage import ContentAddressedStorage
+from posts.images import collect, reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает ссылки постов на файлы картинок и удаляет файлы, '
+        'на которые никто не ссылается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=settings.IMAGE_GC_GRACE,
+            help='Не трогать файлы моложе стольких секунд.',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено.',
+        )
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, ContentAddressedStorage):
+            raise CommandError(
+                'Сборка мусора работает только с хранилищем '
+                'core.storage.ContentAddressedStorage в DEFAULT_FILE_STORAGE.'
+            )
+        reconcile()
+        removed = collect(options['grace'], dry_run=options['dry_run'])
+        for name in removed:
+            self.stdout.write(name)
+        verb = 'К удалению' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} файлов: {len(removed)}'
+        ))
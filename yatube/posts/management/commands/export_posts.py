@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts.transfer import EXPORTS, FORMATS, export_rows, write_rows
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает посты, комментарии или подписки в NDJSON/CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default='-',
+                            help='Файл выгрузки; «-» — stdout.')
+        parser.add_argument('--model', choices=EXPORTS, default='posts')
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        output = options['output']
+        fmt = options['format'] or (
+            'csv' if output.endswith('.csv') else 'ndjson')
+        rows = export_rows(options['model'], options['chunk_size'])
+        if output == '-':
+            written = write_rows(rows, self.stdout, fmt, options['model'])
+        else:
+            with open(output, 'w', encoding='utf-8', newline='') as stream:
+                written = write_rows(rows, stream, fmt, options['model'])
+        self.stderr.write(f'Выгружено строк: {written}')
@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.transfer import (EXPORTS, FORMATS, ImportConflict, Importer,
+                            read_rows)
+
+
+class Command(BaseCommand):
+    help = ('Загружает посты, комментарии или подписки из NDJSON/CSV '
+            'пакетами bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Файл выгрузки; «-» — stdin.')
+        parser.add_argument('--model', choices=EXPORTS, default='posts')
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['input']
+        fmt = options['format'] or (
+            'csv' if path.endswith('.csv') else 'ndjson')
+        importer = Importer(options['model'], options['batch_size'])
+        try:
+            if path == '-':
+                loaded, skipped = importer.load(read_rows(sys.stdin, fmt))
+            else:
+                with open(path, encoding='utf-8', newline='') as stream:
+                    loaded, skipped = importer.load(read_rows(stream, fmt))
+        except ImportConflict as error:
+            raise CommandError(
+                f'id заняты другими записями: {error}. '
+                f'Загружено строк до ошибки: {importer.loaded}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено строк: {loaded}, пропущено: {skipped}'
+        ))
@@ -0,0 +1,52 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import generate
+
+
+def image_batches(size):
+    """Имена картинок пачками по pk: память не растёт с числом постов."""
+    last_pk = 0
+    while True:
+        batch = list(
+            Post.objects.filter(pk__gt=last_pk).exclude(image='').order_by(
+                'pk').values_list('pk', 'image')[:size]
+        )
+        if not batch:
+            return
+        last_pk = batch[-1][0]
+        yield [name for pk, name in batch]
+
+
+class Command(BaseCommand):
+    help = 'Заранее создаёт миниатюры для всех постов с картинками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Число процессов; 1 — без пула.',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        created = 0
+        if workers <= 1:
+            for batch in image_batches(options['batch_size']):
+                created += sum(map(generate, batch))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for batch in image_batches(options['batch_size']):
+                    # Дочерние процессы не должны делить соединение с БД.
+                    connections.close_all()
+                    created += sum(executor.map(
+                        generate, batch,
+                        chunksize=max(1, len(batch) // workers)
+                    ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано миниатюр: {created}'
+        ))
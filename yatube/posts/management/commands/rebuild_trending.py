@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.trending import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинги популярных постов с нуля.'
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рейтингов: {rebuilt}'
+        ))
@@ -0,0 +1,81 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:28
+
+import math
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Значения posts.constants на момент миграции.
+DECAY = math.log(2) / (6 * 60 * 60)
+FOLLOWER_WEIGHT = 0.5
+BATCH_SIZE = 500
+
+
+def logaddexp(first, second):
+    if first is None:
+        return second
+    if second is None:
+        return first
+    high, low = max(first, second), min(first, second)
+    return high + math.log1p(math.exp(low - high))
+
+
+def fill_scores(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    PostScore = apps.get_model('posts', 'PostScore')
+    followers = dict(AuthorStats.objects.values_list(
+        'user_id', 'follower_count'))
+    activity = {}
+    comments = Comment.objects.order_by().values_list('post_id', 'created')
+    for post_id, created in comments.iterator():
+        activity[post_id] = logaddexp(
+            activity.get(post_id), DECAY * created.timestamp())
+    last = 0
+    while True:
+        batch = list(Post.objects.filter(pk__gt=last).order_by(
+            'pk').values_list('pk', 'pub_date', 'author_id')[:BATCH_SIZE])
+        if not batch:
+            break
+        scores = []
+        for pk, pub_date, author_id in batch:
+            weight = 1 + FOLLOWER_WEIGHT * math.log1p(
+                followers.get(author_id) or 0)
+            scores.append(PostScore(
+                post_id=pk,
+                activity=activity.get(pk),
+                score=logaddexp(
+                    math.log(weight) + DECAY * pub_date.timestamp(),
+                    activity.get(pk)),
+            ))
+        PostScore.objects.bulk_create(scores)
+        last = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostScore',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='posts.Post')),
+                ('activity', models.FloatField(help_text='Затухающая сумма комментариев, логарифм', null=True)),
+                ('score', models.FloatField()),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='postscore',
+            index=models.Index(fields=['score'], name='post_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postscore',
+            index=models.Index(fields=['updated'], name='post_score_updated_idx'),
+        ),
+        migrations.RunPython(fill_scores, migrations.RunPython.noop),
+    ]
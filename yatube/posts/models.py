@@ -4,6 +4,22 @@ from django.db import models
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: автор и группа одним JOIN, только нужные поля."""
+        return self.select_related('author', 'group').only(
+            'text',
+            'pub_date',
+            'image',
+            'comment_count',
+            'author__username',
+            'author__first_name',
+            'author__last_name',
+            'group__title',
+            'group__slug',
+        ).order_by('-pub_date', '-pk')
+
+
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField(auto_now_add=True)
@@ -24,16 +40,52 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
+
+    # Имя картинки в базе; по нему сигналы переносят ссылку на файл.
+    # None — неизвестно: объект собран вручную или image отложено.
+    _loaded_image = None
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pub_date'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', 'pub_date'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', 'pub_date'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['image'], name='post_image_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.text
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super().from_db(db, field_names, values)
+        if 'image' in post.__dict__:
+            post._loaded_image = post.__dict__['image'] or ''
+        return post
+
+
+class GroupQuerySet(models.QuerySet):
+    def with_stats(self):
+        """Группы с числом постов и датой последнего — одним GROUP BY."""
+        return self.annotate(
+            post_count=models.Count('posts'),
+            latest_post=models.Max('posts__pub_date'),
+        ).order_by('title')
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
     description = models.TextField()
 
+    objects = GroupQuerySet.as_manager()
+
     def __str__(self):
         return self.title
 
@@ -54,6 +106,12 @@ class Comment(models.Model):
         related_name='comments',
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
+
     def __str__(self):
         return self.text
 
@@ -75,6 +133,102 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='unique_user_author')
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user} подписался на {self.author}'
+
+
+class FeedEntry(models.Model):
+    """Материализованная запись ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_feed_user_post')
+        ]
+        indexes = [
+            models.Index(fields=['user', 'pub_date'],
+                         name='feed_user_pub_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='feed_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post} в ленте {self.user}'
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счётчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    post_count = models.PositiveIntegerField(default=0)
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'Счётчики {self.user}'
+
+
+class PostScore(models.Model):
+    """Рейтинг поста для ленты популярного, см. posts.trending."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+    )
+    activity = models.FloatField(
+        null=True,
+        help_text='Затухающая сумма комментариев, логарифм',
+    )
+    score = models.FloatField()
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['score'], name='post_score_idx'),
+            models.Index(fields=['updated'], name='post_score_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f'Рейтинг {self.post_id}: {self.score:.2f}'
+
+
+class ImageBlob(models.Model):
+    """Файл в хранилище картинок и число постов, которые на него ссылаются."""
+    name = models.CharField(max_length=100, unique=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ref_count', 'created'],
+                         name='image_blob_unused_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.ref_count})'
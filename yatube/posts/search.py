@@ -0,0 +1,90 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+
+INSTALL_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"text, content='posts_post', content_rowid='id')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON posts_post "
+    f"BEGIN INSERT INTO {FTS_TABLE}(rowid, text) "
+    f"VALUES (new.id, new.text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON posts_post "
+    f"BEGIN INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) "
+    f"VALUES ('delete', old.id, old.text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au "
+    f"AFTER UPDATE OF text ON posts_post "
+    f"BEGIN INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) "
+    f"VALUES ('delete', old.id, old.text); "
+    f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); END",
+)
+
+
+def is_supported(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install(using=connection):
+    """Создаёт FTS5-индекс и триггеры синхронизации с posts_post.
+
+    SQLite теряет триггеры, когда миграция пересоздаёт таблицу, поэтому
+    функция вызывается после каждого migrate и при необходимости
+    перестраивает индекс целиком.
+    """
+    if not is_supported(using):
+        return
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' "
+            "AND name LIKE %s", [f'{FTS_TABLE}_a_']
+        )
+        installed = cursor.fetchone()[0] == len(INSTALL_SQL) - 1
+        for statement in INSTALL_SQL:
+            cursor.execute(statement)
+        if not installed:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def match_expression(query):
+    """Превращает ввод пользователя в безопасный запрос FTS5."""
+    terms = [f'"{term}"' for term in re.findall(r'\w+', query)]
+    if terms:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+class _InSubquery(RawSQL):
+    # Django 2.2 сам берёт правую часть IN в скобки. Со вторыми скобками
+    # RawSQL SQLite читает (SELECT ...) как скаляр и берёт одну строку.
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+def search_posts(query, queryset=None):
+    """Посты по полнотекстовому запросу, от самых релевантных (bm25)."""
+    queryset = Post.objects.for_feed() if queryset is None else queryset
+    match = match_expression(query)
+    if not match:
+        return queryset.none()
+    if not is_supported():
+        return queryset.filter(text__icontains=query)
+    rank = RawSQL(
+        f'SELECT bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s AND rowid = posts_post.id',
+        (match,)
+    )
+    return queryset.filter(pk__in=matching_ids(query)).annotate(
+        rank=rank).order_by('rank', '-pub_date')
+
+
+def matching_ids(query):
+    """Подзапрос с id подходящих постов — для фильтрации pk__in."""
+    return _InSubquery(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (match_expression(query),)
+    )
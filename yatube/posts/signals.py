@@ -0,0 +1,130 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import feed, images, trending
+from .caching import bump_feed_version, bump_groups_version
+from .counters import bump_author, bump_comments
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        feed.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        feed.backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_feed(sender, instance, **kwargs):
+    feed.trim(instance)
+
+
+@receiver([post_save, post_delete], sender=Post)
+@receiver([post_save, post_delete], sender=Group)
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_feed_cache(sender, **kwargs):
+    # До коммита другой воркер увидел бы новую версию, но не новые строки,
+    # и закэшировал бы под ней устаревшую страницу.
+    transaction.on_commit(bump_feed_version)
+
+
+@receiver([post_save, post_delete], sender=Post)
+@receiver([post_save, post_delete], sender=Group)
+def invalidate_group_index(sender, **kwargs):
+    transaction.on_commit(bump_groups_version)
+
+
+@receiver(post_save, sender=User)
+def create_author_stats(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, **kwargs):
+    if created:
+        bump_author(instance.author_id, post_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    bump_author(instance.author_id, post_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created and instance.post_id is not None:
+        bump_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    if instance.post_id is not None:
+        bump_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        bump_author(instance.author_id, follower_count=1)
+        bump_author(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    bump_author(instance.author_id, follower_count=-1)
+    bump_author(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def score_post(sender, instance, created, **kwargs):
+    if created:
+        trending.add_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def score_comment(sender, instance, created, **kwargs):
+    if created and instance.post_id is not None:
+        trending.add_comment(instance)
+
+
+@receiver(post_save, sender=Follow)
+def rescore_followed(sender, instance, created, **kwargs):
+    if created:
+        trending.reweigh_author(instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def rescore_unfollowed(sender, instance, **kwargs):
+    trending.reweigh_author(instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_image(sender, instance, update_fields, **kwargs):
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    if instance.pk is not None and instance._loaded_image is None:
+        instance._loaded_image = Post.objects.filter(
+            pk=instance.pk).values_list('image', flat=True).first() or ''
+
+
+@receiver(post_save, sender=Post)
+def count_image(sender, instance, update_fields, **kwargs):
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    stored = instance._loaded_image or ''
+    if instance.image.name != stored:
+        images.retain(instance.image.name)
+        images.release(stored)
+    instance._loaded_image = instance.image.name or ''
+
+
+@receiver(post_delete, sender=Post)
+def uncount_image(sender, instance, **kwargs):
+    images.release(instance.image.name)
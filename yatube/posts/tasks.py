@@ -0,0 +1,34 @@
+from taskqueue.registry import task
+
+from . import feed, images, thumbnails
+from .models import Follow, Post
+
+
+@task
+def deliver_post(post_id):
+    post = Post.objects.filter(pk=post_id).only(
+        'pk', 'author_id', 'pub_date').first()
+    if post is not None:
+        feed.deliver(post)
+
+
+@task
+def backfill_follow(follow_id):
+    follow = Follow.objects.filter(pk=follow_id).first()
+    if follow is not None:
+        feed.copy_posts(follow)
+
+
+@task
+def pull_popular(user_id):
+    feed.pull_popular(user_id)
+
+
+@task
+def generate_thumbnails(name):
+    thumbnails.generate(name)
+
+
+@task
+def process_image(name):
+    images.process(name)
@@ -0,0 +1,100 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..constants import NUMBER_OF_POSTS
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Testname1')
+        cls.follower = User.objects.create(username='Testname2')
+        cls.group = Group.objects.create(
+            title='Тестовый тайтл',
+            slug='Test_slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create([
+            Post(text=f'Пост {i}', author=cls.user, group=cls.group)
+            for i in range(NUMBER_OF_POSTS + 3)
+        ])
+        cls.post = Post.objects.latest('pk')
+        Comment.objects.create(text='Комментарий', post=cls.post,
+                               author=cls.follower)
+        Follow.objects.create(user=cls.follower, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_feeds_are_paginated_by_cursor(self):
+        urls = (
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args=[self.group.slug]),
+            reverse('posts:api_profile', args=[self.user.username]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(len(data['results']), NUMBER_OF_POSTS)
+                self.assertEqual(data['results'][0], {
+                    'id': self.post.pk,
+                    'text': self.post.text,
+                    'pub_date': self.post.pub_date.isoformat(),
+                    'author': {'username': 'Testname1', 'full_name': ''},
+                    'group': {'slug': 'Test_slug', 'title': 'Тестовый тайтл'},
+                    'image': None,
+                    'comment_count': 1,
+                })
+                data = self.client.get(url, {'cursor': data['next']}).json()
+                self.assertEqual(len(data['results']), 3)
+                self.assertIsNone(data['next'])
+
+    def test_post_detail_includes_comments(self):
+        data = self.client.get(
+            reverse('posts:api_post_detail', args=[self.post.pk])).json()
+        self.assertEqual(data['id'], self.post.pk)
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            ['Комментарий']
+        )
+
+    def test_not_modified(self):
+        url = reverse('posts:api_index')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertFalse(response.has_header('Last-Modified'))
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        Post.objects.create(text='Новый пост', author=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_comment_changes_post_etag(self):
+        url = reverse('posts:api_post_detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(text='Ещё', post=self.post, author=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_follow_feed(self):
+        url = reverse('posts:api_follow_index')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_login(self.follower)
+        response = self.client.get(url)
+        self.assertEqual(len(response.json()['results']), NUMBER_OF_POSTS)
+        self.assertIn('private', response['Cache-Control'])
+        etag = response['ETag']
+        Follow.objects.filter(user=self.follower).delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_read_only(self):
+        response = self.client.post(reverse('posts:api_index'))
+        self.assertEqual(response.status_code, 405)
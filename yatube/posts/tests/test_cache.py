@@ -1,8 +1,11 @@
 from django.core.cache import cache
+from django.db import transaction
 from django.test import Client, TestCase
 from django.urls import reverse
 
-from ..models import Post, User
+from ..caching import feed_version
+from ..models import Comment, Follow, Group, Post, User
+from .utils import committing
 
 
 class CacheTests(TestCase):
@@ -10,20 +13,148 @@ class CacheTests(TestCase):
     def setUpClass(cls):
         super().setUpClass()
         cls.user = User.objects.create(username='Testname')
+        cls.group = Group.objects.create(
+            title='Тестовый тайтл',
+            slug='Test_slug',
+            description='Тестовое описание',
+        )
         cls.post = Post.objects.create(
             author=cls.user,
             text='тестовый пост',
+            group=cls.group,
         )
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
 
-    def test_pages_uses_correct_template(self):
+    def test_index_is_cached(self):
         response = self.guest_client.get(reverse('posts:index'))
         cached = response.content
-        Post.objects.create(text='Второй пост', author=self.user)
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
         response = self.guest_client.get(reverse('posts:index'))
         self.assertEqual(cached, response.content)
         cache.clear()
         response = self.guest_client.get(reverse('posts:index'))
         self.assertNotEqual(cached, response.content)
+
+    def test_post_save_invalidates_index(self):
+        response = self.guest_client.get(reverse('posts:index'))
+        cached = response.content
+        with committing():
+            Post.objects.create(text='Второй пост', author=self.user)
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotEqual(cached, response.content)
+
+    def test_group_save_invalidates_index(self):
+        self.guest_client.get(reverse('posts:index'))
+        self.group.slug = 'New_slug'
+        with committing():
+            self.group.save()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'New_slug')
+
+    def test_version_changes_after_commit(self):
+        version = feed_version()
+        with committing():
+            with transaction.atomic():
+                Post.objects.create(text='Второй пост', author=self.user)
+                self.assertEqual(feed_version(), version)
+            self.assertEqual(feed_version(), version)
+        self.assertNotEqual(feed_version(), version)
+
+    def test_pages_are_cached_separately(self):
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=self.user) for i in range(10)
+        )
+        first = self.guest_client.get(reverse('posts:index'))
+        second = self.guest_client.get(reverse('posts:index') + '?page=2')
+        self.assertNotEqual(first.content, second.content)
+        self.assertContains(second, self.post.text)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Testname')
+        cls.group = Group.objects.create(
+            title='Тестовый тайтл',
+            slug='Test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='тестовый пост',
+            group=cls.group,
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[cls.group.slug]),
+            reverse('posts:profile', args=[cls.user.username]),
+            reverse('posts:post_detail', args=[cls.post.pk]),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_not_modified(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertFalse(response.has_header('Last-Modified'))
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+                self.assertIsNone(response.context)
+
+    def test_edit_changes_etag(self):
+        etags = {url: self.guest_client.get(url)['ETag'] for url in self.urls}
+        self.post.text = 'Исправленный пост'
+        with committing():
+            self.post.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Исправленный пост')
+
+    def test_anonymous_pages_are_public(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('max-age', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+
+    def test_user_pages_are_private(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertIn('private', response['Cache-Control'])
+                self.assertIn('no-cache', response['Cache-Control'])
+                etag = self.guest_client.get(url)['ETag']
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_comment_changes_post_etag(self):
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        etag = self.guest_client.get(url)['ETag']
+        Comment.objects.create(text='Комментарий', post=self.post,
+                               author=self.user)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Комментарий')
+
+    def test_follow_changes_profile_etag(self):
+        follower = User.objects.create(username='Follower')
+        client = Client()
+        client.force_login(follower)
+        url = reverse('posts:profile', args=[self.user.username])
+        etag = client.get(url)['ETag']
+        Follow.objects.create(user=follower, author=self.user)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
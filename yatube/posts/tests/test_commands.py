@@ -0,0 +1,306 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from taskqueue.models import Task
+
+from .. import benchmark, thumbnails
+from ..models import (AuthorStats, Comment, FeedEntry, Follow, Group,
+                      ImageBlob, Post, PostScore, User)
+
+
+class ReconcileCountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Testname1')
+        cls.follower = User.objects.create(username='Testname2')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.author)
+        Comment.objects.create(text='Комментарий', post=cls.post,
+                               author=cls.follower)
+        Follow.objects.create(user=cls.follower, author=cls.author)
+
+    def test_reconcile_fixes_drift(self):
+        Post.objects.update(comment_count=7)
+        AuthorStats.objects.update(
+            post_count=5, follower_count=5, following_count=5)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.post.refresh_from_db()
+        author = AuthorStats.objects.get(user=self.author)
+        follower = AuthorStats.objects.get(user=self.follower)
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertEqual(
+            (author.post_count, author.follower_count,
+             author.following_count),
+            (1, 1, 0)
+        )
+        self.assertEqual(
+            (follower.post_count, follower.follower_count,
+             follower.following_count),
+            (0, 0, 1)
+        )
+
+    def test_reconcile_creates_missing_stats(self):
+        AuthorStats.objects.filter(user=self.author).delete()
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).post_count, 1)
+
+
+class RebuildTrendingTests(TestCase):
+    def test_rebuild_matches_incremental_scores(self):
+        author = User.objects.create(username='Testname1')
+        follower = User.objects.create(username='Testname2')
+        posts = [Post.objects.create(text=f'Пост {i}', author=author)
+                 for i in range(3)]
+        Comment.objects.create(text='Комментарий', post=posts[1],
+                               author=follower)
+        Follow.objects.create(user=follower, author=author)
+        Comment.objects.create(text='Комментарий', post=posts[1],
+                               author=follower)
+        scores = dict(PostScore.objects.values_list('post', 'score'))
+        PostScore.objects.filter(post=posts[0]).delete()
+        PostScore.objects.update(score=0)
+        out = StringIO()
+        call_command('rebuild_trending', stdout=out)
+        self.assertIn('Пересчитано рейтингов: 3', out.getvalue())
+        for post, score in PostScore.objects.values_list('post', 'score'):
+            with self.subTest(post=post):
+                self.assertAlmostEqual(score, scores[post])
+
+
+class PregenerateThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Testname')
+        Post.objects.bulk_create([
+            Post(text='С картинкой', author=cls.author, image=f'posts/{i}.gif')
+            for i in range(3)
+        ] + [Post(text='Без картинки', author=cls.author)])
+
+    @mock.patch('posts.thumbnails.get_thumbnail')
+    def test_generates_every_size_for_every_image(self, get_thumbnail):
+        call_command('pregenerate_thumbnails', workers=1, batch_size=2,
+                     stdout=StringIO())
+        self.assertEqual(
+            sorted(call.args[0].name
+                   for call in get_thumbnail.call_args_list),
+            ['posts/0.gif', 'posts/1.gif', 'posts/2.gif']
+        )
+
+
+class CollectImagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Testname')
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def store(self, content):
+        return default_storage.save('posts/image.gif', ContentFile(content))
+
+    def collect(self, *args):
+        out = StringIO()
+        call_command('collect_images', *args, stdout=out)
+        return out.getvalue()
+
+    def test_unreferenced_files_are_removed(self):
+        kept = self.store(b'kept')
+        dropped = self.store(b'dropped')
+        orphan = self.store(b'orphan')
+        post = Post.objects.create(text='Пост', author=self.author,
+                                   image=kept)
+        Post.objects.create(text='Пост', author=self.author, image=dropped)
+        Post.objects.filter(image=dropped).delete()
+        self.assertEqual(ImageBlob.objects.get(name=dropped).ref_count, 0)
+        self.assertIn('Удалено файлов: 0', self.collect())
+        self.assertIn('К удалению файлов: 2',
+                      self.collect('--grace=0', '--dry-run'))
+        self.assertTrue(default_storage.exists(dropped))
+        self.assertIn('Удалено файлов: 2', self.collect('--grace=0'))
+        self.assertTrue(default_storage.exists(post.image.name))
+        self.assertFalse(default_storage.exists(dropped))
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertFalse(ImageBlob.objects.filter(name=dropped).exists())
+
+    @override_settings(
+        DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage')
+    def test_other_storage_is_refused(self):
+        with self.assertRaisesMessage(CommandError, 'ContentAddressedStorage'):
+            self.collect('--grace=0')
+
+    def test_reconcile_restores_references(self):
+        name = self.store(b'shared')
+        Post.objects.bulk_create([
+            Post(text='Импорт', author=self.author, image=name)
+            for _ in range(2)
+        ])
+        self.collect('--grace=0')
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(ImageBlob.objects.get(name=name).ref_count, 2)
+
+    def test_changing_image_moves_reference(self):
+        first, second = self.store(b'first'), self.store(b'second')
+        post = Post.objects.create(text='Пост', author=self.author,
+                                   image=first)
+        post.image = second
+        post.save()
+        self.assertEqual(
+            dict(ImageBlob.objects.values_list('name', 'ref_count')),
+            {first: 0, second: 1})
+
+    def test_saving_loaded_post_does_not_reread_image(self):
+        name = self.store(b'image')
+        Post.objects.create(text='Пост', author=self.author, image=name)
+        post = Post.objects.get()
+        post.text = 'Правка'
+        with CaptureQueriesContext(connection) as queries:
+            post.save()
+            post.save()
+        self.assertFalse([query for query in queries
+                          if query['sql'].startswith('SELECT')])
+        self.assertEqual(ImageBlob.objects.get(name=name).ref_count, 1)
+
+
+class EnqueueThumbnailsTests(TestCase):
+    def test_enqueue_creates_single_task(self):
+        author = User.objects.create(username='Testname')
+        post = Post(text='С картинкой', author=author, image='posts/1.gif')
+        thumbnails.enqueue(post)
+        thumbnails.enqueue(post)
+        task = Task.objects.get()
+        self.assertEqual(task.name, 'posts.tasks.generate_thumbnails')
+        self.assertEqual(task.key, 'thumbnails:posts/1.gif')
+
+
+class BenchmarkTests(TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([3], 95), 3)
+
+    def test_seed_and_run_report_every_view(self):
+        dataset = benchmark.seed(
+            users=5, groups=2, posts=30, comments=30, follows=2)
+        self.assertEqual(Post.objects.count(), dataset['posts'])
+        results = benchmark.run(requests=2)
+        self.assertEqual(set(results), {
+            'index', 'group_posts', 'profile', 'post_detail',
+            'follow_index', 'trending', 'post_create', 'add_comment',
+            'admin_posts',
+        })
+        for metrics in results.values():
+            self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+            self.assertGreater(metrics['queries_max'], 0)
+
+
+class TransferCommandsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Testname1')
+        cls.follower = User.objects.create(username='Testname2')
+        cls.group = Group.objects.create(
+            title='Тестовый тайтл', slug='Test_slug', description='Описание')
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.author, group=cls.group)
+        Comment.objects.create(text='Комментарий', post=cls.post,
+                               author=cls.follower)
+        Follow.objects.create(user=cls.follower, author=cls.author)
+
+    def dump(self, model, fmt):
+        path = os.path.join(self.tmp, f'{model}.{fmt}')
+        call_command('export_posts', path, model=model, stderr=StringIO())
+        return path
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def test_round_trip(self):
+        for fmt in ('ndjson', 'csv'):
+            with self.subTest(fmt=fmt):
+                paths = [self.dump(model, fmt)
+                         for model in ('posts', 'comments', 'follows')]
+                pub_date = Post.objects.get().pub_date
+                created = Comment.objects.get().created
+                Post.objects.all().delete()
+                Follow.objects.all().delete()
+                for model, path in zip(
+                        ('posts', 'comments', 'follows'), paths):
+                    call_command('import_posts', path, model=model,
+                                 stdout=StringIO())
+                post = Post.objects.get()
+                self.assertEqual(
+                    (post.pk, post.text, post.pub_date, post.group),
+                    (self.post.pk, 'Тестовый пост', pub_date, self.group)
+                )
+                self.assertEqual(post.comment_count, 1)
+                self.assertEqual(
+                    (post.comments.get().text, post.comments.get().created),
+                    ('Комментарий', created)
+                )
+                self.assertEqual(
+                    AuthorStats.objects.get(user=self.author).follower_count,
+                    1
+                )
+                self.assertTrue(FeedEntry.objects.filter(
+                    user=self.follower, post=post).exists())
+
+    def write(self, rows):
+        path = os.path.join(self.tmp, 'posts.ndjson')
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write('\n'.join(json.dumps(row) for row in rows))
+        return path
+
+    def test_import_is_idempotent_and_skips_unknown_rows(self):
+        path = self.write([
+            {'text': 'Новый пост', 'author': 'Testname1', 'group': None},
+            {'text': 'Чужой пост', 'author': 'nobody', 'group': None},
+            {'id': self.post.pk, 'text': 'Тестовый пост',
+             'author': 'Testname1', 'group': 'Test_slug',
+             'pub_date': self.post.pub_date.isoformat()},
+        ])
+        out = StringIO()
+        call_command('import_posts', path, batch_size=2, stdout=out)
+        self.assertIn('Загружено строк: 1, пропущено: 2', out.getvalue())
+        self.assertEqual(Post.objects.count(), 2)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.text, 'Тестовый пост')
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).post_count, 2)
+
+    def test_taken_id_stops_import(self):
+        path = self.write([
+            {'text': 'Новый пост', 'author': 'Testname1', 'group': None},
+            {'id': self.post.pk, 'text': 'Другой пост',
+             'author': 'Testname2', 'group': None},
+        ])
+        with self.assertRaisesMessage(CommandError, str(self.post.pk)):
+            call_command('import_posts', path, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.text, 'Тестовый пост')
+
+    def test_existing_follows_are_not_counted(self):
+        path = self.dump('follows', 'ndjson')
+        out = StringIO()
+        call_command('import_posts', path, model='follows', stdout=out)
+        self.assertIn('Загружено строк: 0, пропущено: 1', out.getvalue())
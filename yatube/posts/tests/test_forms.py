@@ -1,8 +1,20 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
+from taskqueue.models import Task
+from taskqueue.worker import run_pending
+
+from ..models import Comment, Group, ImageBlob, Post, User
 
-from ..models import Comment, Group, Post, User
+STORED_NAME = r'^posts/([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}\.jpg$'
 
 
 class PostCreateFormTests(TestCase):
@@ -49,6 +61,20 @@ class PostCreateFormTests(TestCase):
             post_count
         )
 
+    @mock.patch('posts.views.enqueue')
+    def test_post_create_enqueues_thumbnails(self, enqueue):
+        uploaded = SimpleUploadedFile(
+            name='picture.gif',
+            content=self.picture,
+            content_type='image/gif'
+        )
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': uploaded},
+        )
+        enqueue.assert_called_once_with(
+            Post.objects.get(text='Пост с картинкой'))
+
     def test_post_edit(self):
         post_before = {
             'text': 'Пост до редактирования',
@@ -132,3 +158,100 @@ class CommentFormTests(TestCase):
             Comment.objects.filter(post=self.post.pk).count()
         )
         self.assertRedirects(response, f'/posts/{self.post.pk}/')
+
+
+@override_settings(IMAGE_MAX_DIMENSION=100, IMAGE_FORMAT='JPEG')
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Testname')
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=self.media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client.force_login(self.user)
+
+    def upload(self, name='photo.jpg', fmt='JPEG', size=(400, 300),
+               mode='RGB', **options):
+        buffer = BytesIO()
+        Image.new(mode, size, 'red').save(buffer, fmt, **options)
+        self.client.post(reverse('posts:post_create'), {
+            'text': name,
+            'image': SimpleUploadedFile(name, buffer.getvalue()),
+        })
+        return Post.objects.filter(text=name).last()
+
+    def stored_files(self):
+        return [name for _, _, files in os.walk(self.media)
+                for name in files]
+
+    def test_image_is_processed_off_request(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'Камера'
+        post = self.upload(exif=exif.tobytes())
+        original = post.image.name
+        self.assertRegex(original, STORED_NAME)
+        run_pending()
+        post.refresh_from_db()
+        self.assertRegex(post.image.name, STORED_NAME)
+        self.assertNotEqual(post.image.name, original)
+        with default_storage.open(post.image.name) as stored:
+            image = Image.open(stored)
+            self.assertEqual(image.size, (100, 75))
+            self.assertNotIn('exif', image.info)
+            self.assertTrue(image.info.get('progressive'))
+        self.assertTrue(Task.objects.filter(
+            key=f'thumbnails:{post.image.name}').exists())
+        self.assertEqual(
+            ImageBlob.objects.get(name=post.image.name).ref_count, 1)
+        self.assertEqual(ImageBlob.objects.get(name=original).ref_count, 0)
+
+    def test_same_image_is_stored_once(self):
+        first = self.upload('first.jpg')
+        second = self.upload('first.jpg')
+        self.assertEqual(second.image.name, first.image.name)
+        run_pending()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(len(self.stored_files()), 2)
+
+    def test_optimized_image_is_kept(self):
+        post = self.upload('small.jpg', size=(50, 40))
+        name = post.image.name
+        run_pending()
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, name)
+
+    def test_transparency_is_flattened_for_jpeg(self):
+        post = self.upload('logo.png', 'PNG', mode='RGBA')
+        run_pending()
+        post.refresh_from_db()
+        with default_storage.open(post.image.name) as stored:
+            self.assertEqual(Image.open(stored).mode, 'RGB')
+
+    def test_animation_is_kept(self):
+        buffer = BytesIO()
+        frames = [Image.new('P', (10, 10), color) for color in (1, 2)]
+        frames[0].save(buffer, 'GIF', save_all=True,
+                       append_images=frames[1:])
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'Анимация',
+            'image': SimpleUploadedFile('anim.gif', buffer.getvalue()),
+        })
+        run_pending()
+        post = Post.objects.get(text='Анимация')
+        self.assertTrue(post.image.name.endswith('.gif'))
+        self.assertTrue(default_storage.exists(post.image.name))
+
+    @override_settings(IMAGE_MAX_UPLOAD_SIZE=100, IMAGE_MAX_PIXELS=10 ** 6)
+    def test_limits(self):
+        self.assertIsNone(self.upload('big.bmp', 'BMP'))
+        with override_settings(IMAGE_MAX_UPLOAD_SIZE=10 ** 6,
+                               IMAGE_MAX_PIXELS=100):
+            self.assertIsNone(self.upload('wide.png', 'PNG'))
+        self.assertFalse(Post.objects.exists())
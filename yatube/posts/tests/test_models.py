@@ -1,6 +1,6 @@
 from django.test import TestCase
 
-from ..models import Group, Post, User
+from ..models import AuthorStats, Comment, Follow, Group, Post, User
 
 
 class PostModelTest(TestCase):
@@ -34,3 +34,38 @@ class GroupModelTest(TestCase):
         group = self.group
         expected_group_name = group.title
         self.assertEqual(expected_group_name, str(group))
+
+
+class CounterTests(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.follower = User.objects.create_user(username='follower')
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_post_count(self):
+        post = Post.objects.create(author=self.author, text='тестовый пост')
+        self.assertEqual(self.stats(self.author).post_count, 1)
+        post.delete()
+        self.assertEqual(self.stats(self.author).post_count, 0)
+
+    def test_comment_count(self):
+        post = Post.objects.create(author=self.author, text='тестовый пост')
+        comment = Comment.objects.create(
+            post=post, author=self.follower, text='комментарий')
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+
+    def test_follow_counts(self):
+        follow = Follow.objects.create(user=self.follower, author=self.author)
+        self.assertEqual(self.stats(self.author).follower_count, 1)
+        self.assertEqual(self.stats(self.follower).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.stats(self.author).follower_count, 0)
+        self.assertEqual(self.stats(self.follower).following_count, 0)
@@ -0,0 +1,73 @@
+import re
+
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+def query_plan(sql):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class QueryPlanTests(TestCase):
+    """Горячие запросы лент не должны сканировать таблицы целиком."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Testname1')
+        cls.follower = User.objects.create_user(username='Testname2')
+        cls.group = Group.objects.create(
+            title='Тестовый тайтл',
+            slug='Test_slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.follower, author=cls.author)
+        cls.post = Post.objects.create(
+            text='Тестовый текст',
+            author=cls.author,
+            group=cls.group,
+        )
+        Comment.objects.create(
+            text='Тестовый комментарий',
+            post=cls.post,
+            author=cls.follower,
+        )
+
+    def setUp(self):
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def assertIndexedQueries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            self.follower_client.get(url)
+        for query in context.captured_queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            for step in query_plan(query['sql']):
+                with self.subTest(url=url, sql=query['sql'], step=step):
+                    self.assertIsNone(FULL_SCAN.match(step))
+                    self.assertNotIn(TEMP_SORT, step)
+
+    def test_feed_views_use_indexes(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:index') + '?cursor=',
+            reverse('posts:index') + '?page=2',
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:comments', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+            reverse('posts:trending'),
+        )
+        for url in urls:
+            self.assertIndexedQueries(url)
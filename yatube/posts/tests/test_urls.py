@@ -65,6 +65,7 @@ class PostURLTests(TestCase):
         urls = {
             'posts/index.html': '/',
             'posts/group_list.html': '/group/Test_slug/',
+            'posts/group_index.html': '/groups/',
             'posts/post_detail.html': f'/posts/{self.post.id}/',
             'posts/profile.html': '/profile/Testname/',
             'posts/create.html': f'/posts/{self.post.id}/edit/',
@@ -1,9 +1,22 @@
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import urlencode
+
 from django import forms
+from django.core.cache import cache
 from django.shortcuts import get_object_or_404
 from django.test import Client, TestCase
 from django.urls import reverse
+from django.utils import timezone
 
-from posts.models import Follow, Group, Post, User
+from posts import feed, trending
+from posts.constants import COMMENTS_PER_PAGE, NUMBER_OF_POSTS
+from posts.models import (Comment, FeedEntry, Follow, Group, Post, PostScore,
+                          User)
+from posts.tests.utils import QueryCountMixin, committing
+from posts.utils import EstimatedCountPaginator
+from taskqueue.models import Task
+from taskqueue.worker import run_pending
 
 
 class PostPagesTests(TestCase):
@@ -124,6 +137,9 @@ class PaginatorViewsTest(TestCase):
             ]
         )
 
+    def setUp(self):
+        cache.clear()
+
     def test_first_page_contains(self):
         PAGE_LIMIT = 10
         url_names = {
@@ -163,6 +179,71 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(len(response.context['page_obj']), expected)
 
 
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Testname')
+        cls.group = Group.objects.create(
+            title='Тестовый тайтл',
+            slug='Test_slug',
+            description='Тестовое описание'
+        )
+        Post.objects.bulk_create(
+            [
+                Post(
+                    text=f'Тестовый текст{i}',
+                    author=cls.user,
+                    group=cls.group
+                )
+                for i in range(0, 13)
+            ]
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_pages(self):
+        url_names = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', args=[self.user]),
+        )
+        for value in url_names:
+            with self.subTest(value=value):
+                first = self.client.get(value + '?cursor=')
+                first_page = first.context['page_obj']
+                self.assertEqual(len(first_page), 10)
+                self.assertFalse(first_page.has_previous())
+                second = self.client.get(
+                    value + f'?cursor={first_page.next_cursor}'
+                )
+                second_page = second.context['page_obj']
+                self.assertEqual(len(second_page), 3)
+                self.assertFalse(second_page.has_next())
+                back = self.client.get(
+                    value + f'?cursor={second_page.previous_cursor}'
+                )
+                self.assertEqual(
+                    list(back.context['page_obj']), list(first_page)
+                )
+
+    def test_cursor_pages_do_not_overlap(self):
+        response = self.client.get(reverse('posts:index') + '?cursor=')
+        first_page = response.context['page_obj']
+        response = self.client.get(
+            reverse('posts:index') + f'?cursor={first_page.next_cursor}'
+        )
+        seen = {post.pk for post in first_page}
+        seen.update(post.pk for post in response.context['page_obj'])
+        self.assertEqual(len(seen), Post.objects.count())
+
+    def test_invalid_cursor_returns_first_page(self):
+        response = self.client.get(reverse('posts:index') + '?cursor=bad')
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+
 class FollowViewsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -229,3 +310,391 @@ class FollowViewsTest(TestCase):
         response = self.author_client.get(
             reverse('posts:follow_index'))
         self.assertNotIn(self.post, response.context['page_obj'].object_list)
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Testname1')
+        cls.follower = User.objects.create(username='Testname2')
+        cls.old_post = Post.objects.create(
+            text='Старый пост',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def test_follow_backfills_feed(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.follower, post=self.old_post).exists())
+
+    def test_new_post_fans_out(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            response.context['page_obj'].object_list,
+            [post, self.old_post]
+        )
+
+    def test_unfollow_trims_feed(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.follower_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}
+        ))
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.follower).exists()
+        )
+
+    @mock.patch('posts.feed.FEED_FANOUT_LIMIT', 0)
+    def test_popular_author_is_pulled_after_read(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        for _ in range(2):
+            self.follower_client.get(reverse('posts:follow_index'))
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        self.assertEqual(
+            Task.objects.filter(name='posts.tasks.pull_popular').count(), 1)
+        run_pending()
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'].object_list)
+
+    @mock.patch('posts.feed.FEED_FANOUT_LIMIT', 0)
+    def test_pull_keeps_each_author_watermark(self):
+        other = User.objects.create(username='other')
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.follower, author=other)
+        run_pending()
+        older = Post.objects.create(text='Старый пост', author=self.author)
+        newer = Post.objects.create(text='Новый пост', author=other)
+        feed.pull_popular(self.follower.pk)
+        FeedEntry.objects.filter(post=older).delete()
+        feed.pull_popular(self.follower.pk)
+        self.assertEqual(set(FeedEntry.objects.filter(
+            user=self.follower).values_list('post', flat=True)),
+            {self.old_post.pk, older.pk, newer.pk})
+
+    @mock.patch('posts.feed.FEED_ASYNC_THRESHOLD', 0)
+    def test_large_fan_out_is_deferred(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(set(Task.objects.values_list('name', flat=True)), {
+            'posts.tasks.backfill_follow', 'posts.tasks.deliver_post'})
+        run_pending()
+        self.assertEqual(set(FeedEntry.objects.filter(
+            user=self.follower).values_list('post', flat=True)),
+            {post.pk, self.old_post.pk})
+
+
+class QueryCountTests(QueryCountMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.follower = User.objects.create(username='Follower')
+        cls.group = Group.objects.create(
+            title='Тестовый тайтл',
+            slug='Test_slug',
+            description='Тестовое описание',
+        )
+        for i in range(NUMBER_OF_POSTS):
+            author = User.objects.create(username=f'Testname{i}')
+            Follow.objects.create(user=cls.follower, author=author)
+            post = Post.objects.create(
+                text=f'Тестовый текст{i}',
+                author=author,
+                group=cls.group,
+            )
+            Comment.objects.create(text='Комментарий', post=post,
+                                   author=author)
+        cls.author = author
+
+    def setUp(self):
+        cache.clear()
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def test_feed_views_query_count(self):
+        url_names = {
+            reverse('posts:index'): 5,
+            reverse('posts:index') + '?cursor=': 4,
+            reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}
+            ): 6,
+            reverse('posts:profile', args=[self.author.username]): 7,
+            reverse('posts:follow_index'): 6,
+        }
+        for url, number in url_names.items():
+            with self.subTest(url=url):
+                self.assertMaxQueries(number, self.follower_client, url)
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Testname')
+        cls.relevant = Post.objects.create(
+            text='Котики котики и ещё раз котики',
+            author=cls.user,
+        )
+        cls.mention = Post.objects.create(
+            text='Сегодня были собаки, а вчера котики',
+            author=cls.user,
+        )
+        cls.other = Post.objects.create(
+            text='Совсем про другое',
+            author=cls.user,
+        )
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_ranks_by_relevance(self):
+        self.assertEqual(self.search('котики'), [self.relevant, self.mention])
+
+    def test_search_matches_prefix(self):
+        self.assertEqual(self.search('собак'), [self.mention])
+
+    def test_search_index_follows_edits_and_deletes(self):
+        post = Post.objects.create(text='Уникальное слово', author=self.user)
+        self.assertEqual(self.search('уникальное'), [post])
+        post.text = 'Заменённый текст'
+        post.save()
+        self.assertEqual(self.search('уникальное'), [])
+        self.assertEqual(self.search('заменённый'), [post])
+        post.delete()
+        self.assertEqual(self.search('заменённый'), [])
+
+    def test_search_ignores_query_syntax(self):
+        for query in ('"', 'котики OR', 'NEAR(', '*', ''):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    reverse('posts:search'), {'q': query})
+                self.assertEqual(response.status_code, 200)
+
+    def test_search_pagination_keeps_query(self):
+        Post.objects.bulk_create(
+            Post(text=f'котики {i}', author=self.user) for i in range(10)
+        )
+        response = self.client.get(reverse('posts:search'), {'q': 'котики'})
+        self.assertContains(
+            response, '?' + urlencode({'q': 'котики', 'page': 2}).replace(
+                '&', '&amp;')
+        )
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собак'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.mention])
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котики'})
+        self.assertCountEqual(
+            response.context['cl'].result_list, [self.relevant, self.mention])
+
+
+class CommentPaginationTests(QueryCountMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Testname')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        authors = [
+            User.objects.create(username=f'Commenter{i}') for i in range(3)
+        ]
+        Comment.objects.bulk_create([
+            Comment(text=f'Комментарий {i}', post=cls.post,
+                    author=authors[i % 3])
+            for i in range(COMMENTS_PER_PAGE + 5)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_shows_first_page(self):
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0].text, 'Комментарий 0')
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, 'Показать ещё комментарии')
+
+    def test_load_more_fragment(self):
+        first = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        ).context['comments']
+        response = self.client.get(
+            reverse('posts:comments', args=[self.post.pk]),
+            {'cursor': first.next_cursor}
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            [f'Комментарий {i}' for i in range(
+                COMMENTS_PER_PAGE, COMMENTS_PER_PAGE + 5)]
+        )
+        self.assertNotContains(response, 'Показать ещё комментарии')
+
+    def test_load_more_json(self):
+        url = reverse('posts:api_comments', args=[self.post.pk])
+        data = self.client.get(url).json()
+        self.assertEqual(len(data['results']), COMMENTS_PER_PAGE)
+        data = self.client.get(url, {'cursor': data['next']}).json()
+        self.assertEqual(len(data['results']), 5)
+        self.assertIsNone(data['next'])
+
+    def test_comment_authors_are_joined(self):
+        self.assertMaxQueries(
+            3, self.client, reverse('posts:comments', args=[self.post.pk]))
+
+
+class GroupIndexTests(QueryCountMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Testname')
+        cls.groups = [
+            Group.objects.create(title=f'Группа {i}', slug=f'group-{i}',
+                                 description='Описание')
+            for i in range(3)
+        ]
+        for i in range(3):
+            cls.latest = Post.objects.create(
+                text='Тестовый пост', author=cls.user, group=cls.groups[0])
+        Post.objects.create(
+            text='Тестовый пост', author=cls.user, group=cls.groups[1])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_groups_with_counts(self):
+        groups = self.client.get(
+            reverse('posts:group_index')).context['groups']
+        self.assertEqual(
+            [(group['slug'], group['post_count']) for group in groups],
+            [('group-0', 3), ('group-1', 1), ('group-2', 0)]
+        )
+        self.assertEqual(groups[0]['latest_post'], self.latest.pub_date)
+        self.assertIsNone(groups[2]['latest_post'])
+
+    def test_cached_listing_does_not_query(self):
+        url = reverse('posts:group_index')
+        self.client.get(url)
+        self.assertMaxQueries(0, self.client, url)
+        with committing():
+            Group.objects.create(title='Ещё группа', slug='more')
+        self.assertEqual(len(self.client.get(url).context['groups']), 4)
+
+    def test_comment_keeps_cached_listing(self):
+        url = reverse('posts:group_index')
+        self.client.get(url)
+        with committing():
+            Comment.objects.create(
+                text='Комментарий', post=self.latest, author=self.user)
+        self.assertMaxQueries(0, self.client, url)
+
+    def test_moving_post_invalidates_counts(self):
+        url = reverse('posts:group_index')
+        self.client.get(url)
+        self.latest.group = self.groups[2]
+        with committing():
+            self.latest.save()
+        groups = self.client.get(url).context['groups']
+        self.assertEqual(
+            [group['post_count'] for group in groups], [2, 1, 1])
+
+
+class TrendingTests(QueryCountMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Testname1')
+        cls.star = User.objects.create(username='Testname2')
+        cls.reader = User.objects.create(username='Testname3')
+        cls.discussed = Post.objects.create(
+            text='Обсуждаемый пост', author=cls.author)
+        cls.quiet = Post.objects.create(text='Тихий пост', author=cls.author)
+        for i in range(2):
+            Comment.objects.create(text=f'Комментарий {i}',
+                                   post=cls.discussed, author=cls.reader)
+
+    def setUp(self):
+        cache.clear()
+
+    def trending(self):
+        response = self.client.get(reverse('posts:trending'))
+        return response.context['posts']
+
+    def test_comments_raise_post(self):
+        self.assertEqual(self.trending()[:2], [self.discussed, self.quiet])
+
+    def test_followers_raise_fresh_posts(self):
+        post = Post.objects.create(text='Пост звезды', author=self.star)
+        before = PostScore.objects.get(post=post).score
+        Follow.objects.create(user=self.reader, author=self.star)
+        self.assertGreater(PostScore.objects.get(post=post).score, before)
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertAlmostEqual(PostScore.objects.get(post=post).score, before)
+
+    def test_old_comments_decay(self):
+        now = timezone.now()
+        fresh = trending.score(now, 0, trending.moment(now))
+        stale = trending.score(
+            now, 0, trending.moment(now - timedelta(days=1)))
+        self.assertLess(stale, fresh)
+
+    def test_deleted_post_leaves_ranking(self):
+        self.discussed.delete()
+        self.assertEqual(self.trending(), [self.quiet])
+
+    def test_trending_query_count(self):
+        self.assertMaxQueries(3, self.client, reverse('posts:trending'))
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'group-{i}') for i in range(30)
+        )
+        cls.group = Group.objects.first()
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.admin, group=cls.group)
+            for i in range(5)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_changelist_does_not_list_every_group(self):
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Группа 29')
+        self.assertIsNotNone(response.context['cl'].date_hierarchy)
+
+    def test_estimated_count_for_unfiltered_table(self):
+        Post.objects.earliest('pk').delete()
+        queryset = Post.objects.order_by('pk')
+        with mock.patch('posts.utils.EXACT_COUNT_LIMIT', 0):
+            self.assertEqual(
+                EstimatedCountPaginator(queryset, 10).count,
+                Post.objects.latest('pk').pk)
+            self.assertEqual(
+                EstimatedCountPaginator(
+                    queryset.filter(text='Пост 1'), 10).count, 1)
+        self.assertEqual(EstimatedCountPaginator(queryset, 10).count, 4)
@@ -0,0 +1,31 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountMixin:
+    def assertMaxQueries(self, number, client, url):
+        """Страница `url` выполняет не больше `number` SQL-запросов."""
+        with CaptureQueriesContext(connection) as context:
+            client.get(url)
+        self.assertLessEqual(
+            len(context),
+            number,
+            '\n'.join(query['sql'] for query in context.captured_queries)
+        )
+
+
+@contextmanager
+def committing():
+    """Выполняет on_commit-колбэки, отложенные внутри блока.
+
+    TestCase не коммитит транзакцию, а captureOnCommitCallbacks появился
+    только в Django 3.2.
+    """
+    start = len(connection.run_on_commit)
+    yield
+    callbacks = connection.run_on_commit[start:]
+    del connection.run_on_commit[start:]
+    for _, callback in callbacks:
+        callback()
@@ -0,0 +1,41 @@
+import logging
+
+from django.core.files.storage import default_storage
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from taskqueue.registry import enqueue as enqueue_task
+
+from .constants import THUMBNAIL_SIZES
+
+logger = logging.getLogger(__name__)
+
+
+def generate(name):
+    """Создаёт все миниатюры, которые используют шаблоны лент."""
+    created = 0
+    # Хранилище то же, что у Post.image: иначе ключи sorl не совпадут
+    # с ключами шаблонов.
+    source = ImageFile(name, default_storage)
+    try:
+        for geometry, options in THUMBNAIL_SIZES:
+            get_thumbnail(source, geometry, **options)
+            created += 1
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+    return created
+
+
+def enqueue(post):
+    """Ставит генерацию миниатюр в очередь фоновых задач.
+
+    Задача пишется в той же транзакции, что и пост, и выполняется
+    воркером run_tasks; без воркера миниатюры создаются при первом показе.
+    """
+    if post.image:
+        enqueue_name(post.image.name)
+
+
+def enqueue_name(name):
+    enqueue_task('posts.tasks.generate_thumbnails', name,
+                 key=f'thumbnails:{name}')
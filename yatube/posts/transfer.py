@@ -0,0 +1,234 @@
+import csv
+import json
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters, feed, images, trending
+from .caching import bump_feed_version, bump_groups_version
+from .models import Comment, Follow, Group, Post, User
+
+FORMATS = ('ndjson', 'csv')
+
+EXPORTS = {
+    'posts': (
+        Post,
+        ('id', 'text', 'pub_date', 'author', 'group', 'image'),
+        ('pk', 'text', 'pub_date', 'author__username', 'group__slug',
+         'image'),
+    ),
+    'comments': (
+        Comment,
+        ('id', 'post', 'author', 'text', 'created'),
+        ('pk', 'post_id', 'author__username', 'text', 'created'),
+    ),
+    'follows': (
+        Follow,
+        ('user', 'author'),
+        ('user__username', 'author__username'),
+    ),
+}
+
+
+def _serialize(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def export_rows(kind, chunk_size):
+    """Строки выгрузки словарями; память не зависит от размера таблицы."""
+    model, columns, lookups = EXPORTS[kind]
+    rows = model.objects.order_by('pk').values_list(*lookups)
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield dict(zip(columns, map(_serialize, row)))
+
+
+def write_rows(rows, stream, fmt, kind):
+    written = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=EXPORTS[kind][1])
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            written += 1
+        return written
+    for row in rows:
+        stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+        written += 1
+    return written
+
+
+def read_rows(stream, fmt):
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _pk(value):
+    return int(value) if value not in (None, '') else None
+
+
+def _date(value):
+    return parse_datetime(value) if value else timezone.now()
+
+
+class ImportConflict(ValueError):
+    """id из выгрузки занят другой записью."""
+
+    def __init__(self, ids):
+        super().__init__(', '.join(map(str, ids)))
+        self.ids = ids
+
+
+class Importer:
+    """Пакетная загрузка строк выгрузки через bulk_create.
+
+    Посты и комментарии сохраняют id из выгрузки, чтобы связи между
+    файлами не разошлись. Уже загруженные строки пропускаются, а id,
+    занятый другой записью, останавливает загрузку: иначе комментарии
+    прицепились бы к чужому посту.
+    """
+
+    # Поля, по которым строка с занятым id считается уже загруженной.
+    SAME = {
+        'posts': ('author_id', 'pub_date', 'text'),
+        'comments': ('post_id', 'author_id', 'created', 'text'),
+    }
+    # Даты с auto_now_add: bulk_create ставит им текущее время.
+    DATES = {'posts': 'pub_date', 'comments': 'created'}
+
+    def __init__(self, kind, batch_size):
+        self.kind = kind
+        self.batch_size = batch_size
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.loaded = 0
+        self.skipped = 0
+
+    def build_posts(self, rows):
+        for row in rows:
+            author = self.users.get(row['author'])
+            group = self.groups.get(row['group']) if row['group'] else None
+            if author is None or (row['group'] and group is None):
+                self.skipped += 1
+                continue
+            yield Post(
+                pk=_pk(row.get('id')),
+                text=row['text'],
+                pub_date=_date(row.get('pub_date')),
+                author_id=author,
+                group_id=group,
+                image=row.get('image') or '',
+            )
+
+    def build_comments(self, rows):
+        posts = set(Post.objects.filter(
+            pk__in=[_pk(row['post']) for row in rows]
+        ).values_list('pk', flat=True))
+        for row in rows:
+            author = self.users.get(row['author'])
+            if author is None or _pk(row['post']) not in posts:
+                self.skipped += 1
+                continue
+            yield Comment(
+                pk=_pk(row.get('id')),
+                post_id=_pk(row['post']),
+                author_id=author,
+                text=row['text'],
+                created=_date(row.get('created')),
+            )
+
+    def build_follows(self, rows):
+        pairs = set(Follow.objects.filter(
+            user_id__in=[self.users.get(row['user']) for row in rows]
+        ).values_list('user_id', 'author_id'))
+        for row in rows:
+            user = self.users.get(row['user'])
+            author = self.users.get(row['author'])
+            if (user is None or author is None or user == author
+                    or (user, author) in pairs):
+                self.skipped += 1
+                continue
+            pairs.add((user, author))
+            yield Follow(user_id=user, author_id=author)
+
+    def check_ids(self, model, objs):
+        """Отбрасывает уже загруженные строки, на чужих id падает."""
+        fields = self.SAME[self.kind]
+        known = {
+            pk: tuple(values) for pk, *values in model.objects.filter(
+                pk__in=[obj.pk for obj in objs if obj.pk is not None],
+            ).values_list('pk', *fields)
+        }
+        fresh = []
+        conflicts = []
+        for obj in objs:
+            values = tuple(getattr(obj, field) for field in fields)
+            if obj.pk is None:
+                fresh.append(obj)
+            elif obj.pk not in known:
+                known[obj.pk] = values
+                fresh.append(obj)
+            elif known[obj.pk] == values:
+                self.skipped += 1
+            else:
+                conflicts.append(obj.pk)
+        if conflicts:
+            raise ImportConflict(conflicts)
+        return fresh
+
+    def load(self, rows):
+        model = EXPORTS[self.kind][0]
+        build = getattr(self, f'build_{self.kind}')
+        rows = iter(rows)
+        try:
+            while True:
+                batch = list(islice(rows, self.batch_size))
+                if not batch:
+                    break
+                objs = list(build(batch))
+                if self.kind in self.SAME:
+                    objs = self.check_ids(model, objs)
+                self.insert(model, objs)
+                self.loaded += len(objs)
+        finally:
+            self.finish(model)
+        return self.loaded, self.skipped
+
+    def insert(self, model, objs):
+        """Вставляет пакет и возвращает даты из выгрузки.
+
+        Строки без id на SQLite остаются без pk после bulk_create,
+        и их дата остаётся временем загрузки.
+        """
+        field = self.DATES.get(self.kind)
+        dates = [getattr(obj, field) for obj in objs] if field else []
+        with transaction.atomic():
+            model.objects.bulk_create(objs, batch_size=self.batch_size)
+            if not field:
+                return
+            for obj, date in zip(objs, dates):
+                setattr(obj, field, date)
+            model.objects.bulk_update(
+                [obj for obj in objs if obj.pk is not None], [field],
+                batch_size=self.batch_size)
+
+    def finish(self, model):
+        """bulk_create обходит сигналы: досчитываем их работу целиком."""
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+                cursor.execute(sql)
+        with transaction.atomic():
+            counters.reconcile()
+            feed.rebuild()
+            trending.rebuild()
+            images.reconcile()
+        bump_feed_version()
+        bump_groups_version()
@@ -0,0 +1,117 @@
+import math
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .constants import (FEED_BATCH_SIZE, TRENDING_FOLLOWER_WEIGHT,
+                        TRENDING_HALF_LIFE, TRENDING_POSTS,
+                        TRENDING_REWEIGH_WINDOW)
+from .models import AuthorStats, Comment, Post, PostScore
+
+# Прямое затухание: вместо того чтобы со временем уменьшать все рейтинги,
+# событие получает вес exp(DECAY * время). Порядок постов тот же, но
+# рейтинг меняется только при записи. Храним логарифмы, чтобы не
+# переполнить float.
+DECAY = math.log(2) / TRENDING_HALF_LIFE
+
+
+def moment(value):
+    return DECAY * value.timestamp()
+
+
+def logaddexp(first, second):
+    if first is None:
+        return second
+    if second is None:
+        return first
+    high, low = max(first, second), min(first, second)
+    return high + math.log1p(math.exp(low - high))
+
+
+def score(pub_date, followers, activity):
+    """Публикация с весом по подписчикам автора плюс комментарии.
+
+    Удаление комментария рейтинг не уменьшает, а одновременные
+    комментарии могут потерять вклад: этот дрейф убирает rebuild_trending.
+    """
+    weight = 1 + TRENDING_FOLLOWER_WEIGHT * math.log1p(followers or 0)
+    return logaddexp(math.log(weight) + moment(pub_date), activity)
+
+
+def _followers(author_id):
+    return AuthorStats.objects.filter(user_id=author_id).values_list(
+        'follower_count', flat=True).first() or 0
+
+
+def add_post(post):
+    PostScore.objects.get_or_create(post=post, defaults={
+        'score': score(post.pub_date, _followers(post.author_id), None),
+    })
+
+
+def add_comment(comment):
+    row = Post.objects.filter(pk=comment.post_id).values_list(
+        'pub_date', 'author__stats__follower_count', 'score__activity',
+    ).first()
+    if row is None:
+        return
+    pub_date, followers, activity = row
+    activity = logaddexp(activity, moment(comment.created))
+    PostScore.objects.update_or_create(post_id=comment.post_id, defaults={
+        'activity': activity,
+        'score': score(pub_date, followers, activity),
+    })
+
+
+def reweigh_author(author_id):
+    """Пересчитывает свежие посты автора после смены числа подписчиков."""
+    now = timezone.now()
+    followers = _followers(author_id)
+    entries = list(PostScore.objects.filter(
+        post__author_id=author_id,
+        post__pub_date__gte=now - timedelta(seconds=TRENDING_REWEIGH_WINDOW),
+    ).select_related('post').only('activity', 'post__pub_date'))
+    for entry in entries:
+        entry.score = score(entry.post.pub_date, followers, entry.activity)
+        entry.updated = now
+    PostScore.objects.bulk_update(entries, ['score', 'updated'])
+
+
+def top_posts(limit=TRENDING_POSTS):
+    """Самые популярные посты: чтение по индексу рейтинга."""
+    ids = list(PostScore.objects.order_by('-score').values_list(
+        'post_id', flat=True)[:limit])
+    posts = Post.objects.for_feed().in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts]
+
+
+def rebuild(batch_size=FEED_BATCH_SIZE):
+    """Пересчитывает рейтинги всех постов с нуля; возвращает их число."""
+    followers = dict(AuthorStats.objects.values_list(
+        'user_id', 'follower_count'))
+    activity = {}
+    comments = Comment.objects.order_by().values_list('post_id', 'created')
+    for post_id, created in comments.iterator():
+        activity[post_id] = logaddexp(activity.get(post_id), moment(created))
+    rebuilt = 0
+    last = 0
+    with transaction.atomic():
+        PostScore.objects.all().delete()
+        while True:
+            batch = list(Post.objects.filter(pk__gt=last).order_by(
+                'pk').values_list('pk', 'pub_date', 'author_id')[:batch_size])
+            if not batch:
+                break
+            PostScore.objects.bulk_create([
+                PostScore(
+                    post_id=pk,
+                    activity=activity.get(pk),
+                    score=score(pub_date, followers.get(author_id),
+                                activity.get(pk)),
+                )
+                for pk, pub_date, author_id in batch
+            ])
+            rebuilt += len(batch)
+            last = batch[-1][0]
+    return rebuilt
@@ -1,9 +1,175 @@
+import base64
+import binascii
+import json
+
 from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .constants import COMMENTS_PER_PAGE, EXACT_COUNT_LIMIT, NUMBER_OF_POSTS
+from .models import Comment
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(direction, obj, field='pub_date'):
+    payload = json.dumps([direction, getattr(obj, field).isoformat(), obj.pk])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        payload = base64.urlsafe_b64decode(cursor.encode())
+        direction, value, pk = json.loads(payload.decode())
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    value = parse_datetime(value) if isinstance(value, str) else None
+    if direction not in (NEXT, PREVIOUS) or value is None or (
+            not isinstance(pk, int)):
+        raise InvalidCursor(cursor)
+    return direction, value, pk
+
+
+class CursorPage:
+    """Страница, построенная по курсору (дата, id)."""
+    cursor_mode = True
+
+    def __init__(self, object_list, has_next, has_previous, field='pub_date'):
+        self.object_list = object_list
+        self.next_cursor = None
+        self.previous_cursor = None
+        if object_list and has_next:
+            self.next_cursor = encode_cursor(NEXT, object_list[-1], field)
+        if object_list and has_previous:
+            self.previous_cursor = encode_cursor(
+                PREVIOUS, object_list[0], field)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
 
-from .constants import NUMBER_OF_POSTS
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-пагинация: без COUNT(*) и OFFSET на любой глубине.
+
+    По умолчанию идёт от новых постов к старым; field и descending
+    задают другой порядок, например комментарии по возрастанию created.
+    """
+
+    def __init__(self, object_list, per_page, field='pub_date',
+                 descending=True):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.field = field
+        self.descending = descending
+
+    def _slice(self, value, pk, forward):
+        """Строки после (value, pk) в прямом или обратном порядке."""
+        desc = forward == self.descending
+        lookup = 'lt' if desc else 'gt'
+        prefix = '-' if desc else ''
+        rows = self.object_list
+        if value is not None:
+            rows = rows.filter(
+                Q(**{f'{self.field}__{lookup}': value})
+                | Q(**{self.field: value, f'pk__{lookup}': pk})
+            )
+        return list(rows.order_by(
+            prefix + self.field, prefix + 'pk')[:self.per_page + 1])
+
+    def page(self, cursor=None):
+        if not cursor:
+            rows = self._slice(None, None, True)
+            return CursorPage(rows[:self.per_page],
+                              len(rows) > self.per_page, False, self.field)
+        direction, value, pk = decode_cursor(cursor)
+        if direction == NEXT:
+            rows = self._slice(value, pk, True)
+            return CursorPage(rows[:self.per_page],
+                              len(rows) > self.per_page, True, self.field)
+        rows = self._slice(value, pk, False)
+        return CursorPage(rows[:self.per_page][::-1], True,
+                          len(rows) > self.per_page, self.field)
+
+    def get_page(self, cursor):
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+
+def estimate_count(queryset):
+    """Примерное число строк таблицы без прохода по ней.
+
+    PostgreSQL берёт оценку из статистики планировщика, остальные базы —
+    наибольший id, который читается из индекса первичного ключа.
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return max(row[0], 0) if row else 0
+    return model._default_manager.using(queryset.db).aggregate(
+        last=Max('pk'))['last'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator для больших таблиц, которому не нужен COUNT(*).
+
+    Для выборки без фильтров берётся оценка числа строк; точный COUNT
+    выполняется, только если оценка невелика или выборка отфильтрована.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where or query.distinct:
+            return super().count
+        estimate = estimate_count(self.object_list)
+        if estimate <= EXACT_COUNT_LIMIT:
+            return super().count
+        return estimate
 
 
 def paginator(request, post):
+    cursor = request.GET.get('cursor')
+    if cursor is not None:
+        return CursorPaginator(post, NUMBER_OF_POSTS).get_page(cursor)
     paginator = Paginator(post, NUMBER_OF_POSTS)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
+
+
+def comments_page(post_id, cursor=None):
+    """Комментарии поста от старых к новым, страницами по курсору."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author')
+    return CursorPaginator(
+        comments, COMMENTS_PER_PAGE, field='created', descending=False
+    ).get_page(cursor)
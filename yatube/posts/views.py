@@ -1,65 +1,163 @@
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import require_safe
 
+from core.concurrency import gather
+from core.routers import use_replica
+
+from .caching import conditional_render, feed_version, groups_version
+from .constants import FEED_CACHE_TIMEOUT
+from .counters import stats_for
+from .feed import attach_posts, timeline
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
-from .utils import paginator
+from .images import enqueue
+from .models import Comment, Follow, Group, Post, PostScore, User
+from .search import search_posts
+from .trending import top_posts
+from .utils import comments_page, paginator
+
 
+def latest(queryset, field='pub_date'):
+    return queryset.aggregate(value=Max(field))['value']
 
+
+@require_safe
+@use_replica
 def index(request):
-    post_list = Post.objects.all().order_by('-pub_date')
-    page_obj = paginator(request=request, post=post_list)
-    context = {
-        'page_obj': page_obj,
-    }
-    return render(request, 'posts/index.html', context)
+    post_list = Post.objects.for_feed()
+
+    def get_context():
+        return {
+            'page_obj': paginator(request=request, post=post_list),
+            'feed_version': feed_version(),
+            'feed_cache_timeout': FEED_CACHE_TIMEOUT,
+        }
+
+    return conditional_render(request, 'posts/index.html', get_context,
+                              ('index',), latest(post_list))
+
+
+@require_safe
+def group_index(request):
+    groups = cache.get_or_set(
+        f'posts:groups:{groups_version()}',
+        lambda: list(Group.objects.with_stats().values(
+            'title', 'slug', 'description', 'post_count', 'latest_post')),
+        FEED_CACHE_TIMEOUT,
+    )
+    last_modified = max(
+        filter(None, (group['latest_post'] for group in groups)),
+        default=None,
+    )
+    return conditional_render(
+        request, 'posts/group_index.html', lambda: {'groups': groups},
+        ('groups', len(groups)), last_modified)
+
+
+@require_safe
+@use_replica
+def trending(request):
+    def get_context():
+        return {'posts': top_posts()}
 
+    return conditional_render(request, 'posts/trending.html', get_context,
+                              ('trending',),
+                              latest(PostScore.objects, 'updated'))
 
+
+@require_safe
+@use_replica
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = Post.objects.filter(
-        group=group).order_by('-pub_date')
-    page_obj = paginator(request=request, post=post_list)
-    context = {
-        'group': group,
-        'page_obj': page_obj,
-    }
-    return render(request, 'posts/group_list.html', context)
+    post_list = Post.objects.for_feed().filter(group=group)
+
+    def get_context():
+        return {
+            'group': group,
+            'page_obj': paginator(request=request, post=post_list),
+        }
+
+    return conditional_render(request, 'posts/group_list.html', get_context,
+                              ('group', group.pk), latest(post_list))
 
 
+@require_safe
+@use_replica
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = Post.objects.filter(author__username=username
-                                    ).order_by('-pub_date')
-    page_obj = paginator(request=request, post=post_list)
-    post_count = post_list.count()
-    following = request.user.is_authenticated and Follow.objects.filter(
-        user=request.user, author=author).exists()
+    user = request.user if request.user.is_authenticated else None
+    author, following, last_modified = gather(
+        lambda: get_object_or_404(
+            User.objects.select_related('stats'), username=username),
+        lambda: user is not None and Follow.objects.filter(
+            user=user, author__username=username).exists(),
+        lambda: latest(Post.objects.filter(author__username=username)),
+    )
+    post_list = Post.objects.for_feed().filter(author=author)
+    stats = stats_for(author)
+
+    def get_context():
+        return {
+            'author': author,
+            'post_count': stats.post_count,
+            'stats': stats,
+            'page_obj': paginator(request=request, post=post_list),
+            'following': following,
+        }
+
+    scope = ('profile', author.pk, stats.post_count, stats.follower_count,
+             stats.following_count, following)
+    return conditional_render(request, 'posts/profile.html', get_context,
+                              scope, last_modified)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = paginator(request=request, post=search_posts(query))
     context = {
-        'author': author,
-        'post_count': post_count,
+        'query': query,
         'page_obj': page_obj,
-        'following': following,
     }
-    return render(request, 'posts/profile.html', context)
+    return render(request, 'posts/search.html', context)
 
 
+@require_safe
+@use_replica
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    post_list = Post.objects.filter(author__username=post.author)
-    post_count = post_list.count()
-    form = CommentForm()
-    comments = Comment.objects.filter(post=post)
+    post, last_comment = gather(
+        lambda: get_object_or_404(
+            Post.objects.select_related('author__stats', 'group'),
+            pk=post_id),
+        lambda: latest(Comment.objects.filter(post_id=post_id), 'created'),
+    )
+
+    def get_context():
+        return {
+            'post': post,
+            'post_count': stats_for(post.author).post_count,
+            'comments': comments_page(post.pk, request.GET.get('cursor')),
+            'form': CommentForm(),
+        }
+
+    last_modified = max(filter(None, (post.pub_date, last_comment)))
+    return conditional_render(request, 'posts/post_detail.html', get_context,
+                              ('post', post.pk), last_modified)
+
+
+@require_safe
+def comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
     context = {
         'post': post,
-        'post_count': post_count,
-        'comments': comments,
-        'form': form,
+        'comments': comments_page(post.pk, request.GET.get('cursor')),
     }
-    return render(request, 'posts/post_detail.html', context)
+    return render(request, 'posts/includes/comments.html', context)
 
 
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -69,6 +167,7 @@ def post_create(request):
         tmp = form.save(commit=False)
         tmp.author = request.user
         tmp.save()
+        enqueue(tmp)
         return redirect('posts:profile', tmp.author)
     context = {
         'form': form,
@@ -90,6 +189,8 @@ def post_edit(request, post_id):
         return redirect('posts:index')
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            enqueue(post)
         return redirect('posts:post_detail', post_id)
     context = {
         'form': form,
@@ -100,6 +201,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -113,8 +215,10 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator(request=request, post=post_list)
+    # Без реплики: на отстающей копии timeline() не увидел бы свежих
+    # постов популярных авторов и позже поставил бы их в очередь.
+    page_obj = attach_posts(
+        paginator(request=request, post=timeline(request.user)))
     context = {
         'page_obj': page_obj
     }
@@ -122,6 +226,7 @@ def follow_index(request):
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
@@ -130,6 +235,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     follower = Follow.objects.filter(author__username=username,
                                      user=request.user)
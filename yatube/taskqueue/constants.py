@@ -0,0 +1,10 @@
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 2
+BACKOFF_MAX = 60 * 60
+VISIBILITY_TIMEOUT = 10 * 60
+POLL_INTERVAL = 1
+WORKERS = 4
+# Сколько хранить выполненные задачи: пока строка жива, задача с тем же
+# ключом идемпотентности повторно не ставится.
+DONE_RETENTION = 7 * 24 * 60 * 60
+PRUNE_INTERVAL = 60 * 60
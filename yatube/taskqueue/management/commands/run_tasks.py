@@ -0,0 +1,32 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from taskqueue.constants import POLL_INTERVAL, WORKERS
+from taskqueue.worker import Worker
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркер очереди фоновых задач.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=WORKERS)
+        parser.add_argument('--poll-interval', type=float,
+                            default=POLL_INTERVAL)
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти.',
+        )
+
+    def handle(self, *args, **options):
+        worker = Worker(options['workers'], options['poll_interval'])
+        if not options['once']:
+            signal.signal(signal.SIGTERM, lambda *args: worker.stop())
+        try:
+            processed = worker.run(once=options['once'])
+        except KeyboardInterrupt:
+            worker.stop()
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено задач: {processed}'
+        ))
@@ -0,0 +1,33 @@
+import json
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import Task
+
+registry = {}
+
+
+def task(func):
+    """Регистрирует функцию как задачу очереди под именем module.func."""
+    registry[f'{func.__module__}.{func.__name__}'] = func
+    return func
+
+
+def enqueue(func, *args, key=None, delay=0, **kwargs):
+    """Ставит задачу в очередь в текущей транзакции.
+
+    Задача с тем же ключом идемпотентности ставится только один раз.
+    Аргументы должны сериализоваться в JSON.
+    """
+    name = func if isinstance(func, str) else (
+        f'{func.__module__}.{func.__name__}')
+    fields = {
+        'name': name,
+        'payload': json.dumps({'args': args, 'kwargs': kwargs}),
+    }
+    if delay:
+        fields['run_at'] = timezone.now() + timedelta(seconds=delay)
+    if key is None:
+        return Task.objects.create(**fields)
+    return Task.objects.get_or_create(key=key, defaults=fields)[0]
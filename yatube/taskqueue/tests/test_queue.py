@@ -0,0 +1,114 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Task
+from ..registry import enqueue, registry, task
+from ..worker import claim, prune, requeue_stale, run_pending
+
+calls = []
+
+
+@task
+def record(value, suffix=''):
+    calls.append(value + suffix)
+
+
+@task
+def explode():
+    raise RuntimeError('Ошибка в задаче')
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_task_is_registered_by_path(self):
+        self.assertIs(registry['taskqueue.tests.test_queue.record'], record)
+
+    def test_enqueue_and_run(self):
+        enqueue(record, 'a', suffix='!')
+        enqueue('taskqueue.tests.test_queue.record', 'b')
+        self.assertEqual(run_pending(), [Task.DONE, Task.DONE])
+        self.assertEqual(calls, ['a!', 'b'])
+        self.assertEqual(run_pending(), [])
+
+    def test_idempotency_key(self):
+        first = enqueue(record, 'a', key='once')
+        second = enqueue(record, 'b', key='once')
+        self.assertEqual(first.pk, second.pk)
+        run_pending()
+        enqueue(record, 'c', key='once')
+        run_pending()
+        self.assertEqual(calls, ['a'])
+
+    def test_delayed_task_waits(self):
+        enqueue(record, 'a', delay=60)
+        self.assertEqual(run_pending(), [])
+
+    def test_retries_with_backoff(self):
+        item = enqueue(explode)
+        self.assertEqual(run_pending(), [Task.PENDING])
+        item.refresh_from_db()
+        self.assertEqual(item.attempts, 1)
+        self.assertGreater(item.run_at, timezone.now())
+        self.assertIn('Ошибка в задаче', item.last_error)
+        self.assertEqual(run_pending(), [])
+        Task.objects.update(run_at=timezone.now(), attempts=4)
+        self.assertEqual(run_pending(), [Task.FAILED])
+
+    def test_claimed_task_is_not_claimed_twice(self):
+        enqueue(record, 'a')
+        self.assertEqual(len(claim('first', 10)), 1)
+        self.assertEqual(claim('second', 10), [])
+
+    def test_stale_task_is_requeued(self):
+        enqueue(record, 'a')
+        claim('crashed', 10)
+        self.assertEqual(requeue_stale(), 0)
+        Task.objects.update(locked_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(run_pending(), [Task.DONE])
+
+    def test_stale_attempts_are_counted(self):
+        item = enqueue(record, 'a')
+        for attempt in range(1, item.max_attempts + 1):
+            claim('crashed', 10)
+            Task.objects.update(locked_at=timezone.now() - timedelta(days=1))
+            self.assertEqual(requeue_stale(), 1)
+            item.refresh_from_db()
+            self.assertEqual(item.attempts, attempt)
+        self.assertEqual(item.status, Task.FAILED)
+        self.assertEqual(run_pending(), [])
+
+    def test_prune_done_tasks(self):
+        old = enqueue(record, 'a', key='old')
+        enqueue(record, 'b', key='fresh')
+        failed = enqueue(explode, key='failed')
+        run_pending()
+        Task.objects.filter(pk__in=[old.pk, failed.pk]).update(
+            locked_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(prune(), 1)
+        self.assertEqual(
+            set(Task.objects.values_list('key', flat=True)),
+            {'fresh', 'failed'})
+        enqueue(record, 'c', key='old')
+        run_pending()
+        self.assertEqual(calls, ['a', 'b', 'c'])
+
+    def test_run_tasks_command(self):
+        enqueue(record, 'a')
+        enqueue(record, 'b')
+        out = StringIO()
+        call_command('run_tasks', once=True, workers=1, stdout=out)
+        self.assertIn('Выполнено задач: 2', out.getvalue())
+        self.assertEqual(calls, ['a', 'b'])
+
+    @mock.patch('taskqueue.worker.BACKOFF_MAX', 10)
+    def test_backoff_is_capped(self):
+        from ..worker import backoff
+        self.assertLessEqual(backoff(20), timedelta(seconds=11))
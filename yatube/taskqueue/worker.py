@@ -0,0 +1,164 @@
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .constants import (BACKOFF_BASE, BACKOFF_MAX, DONE_RETENTION,
+                        POLL_INTERVAL, PRUNE_INTERVAL, VISIBILITY_TIMEOUT,
+                        WORKERS)
+from .models import Task
+from .registry import registry
+
+logger = logging.getLogger(__name__)
+
+
+def backoff(attempts):
+    """Экспоненциальная пауза перед повтором с небольшим разбросом."""
+    delay = min(BACKOFF_BASE ** attempts, BACKOFF_MAX)
+    return timedelta(seconds=delay + random.uniform(0, delay / 10))
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи упавших воркеров.
+
+    Зависшая попытка засчитывается: задача, которая каждый раз роняет
+    воркер, после max_attempts попыток получает статус FAILED.
+    """
+    deadline = timezone.now() - timedelta(seconds=VISIBILITY_TIMEOUT)
+    stale = Task.objects.filter(status=Task.RUNNING, locked_at__lt=deadline)
+    changes = {
+        'attempts': F('attempts') + 1,
+        'locked_by': '',
+        'last_error': 'Воркер не завершил задачу за VISIBILITY_TIMEOUT.',
+    }
+    failed = stale.filter(attempts__gte=F('max_attempts') - 1).update(
+        status=Task.FAILED, **changes)
+    return failed + stale.update(status=Task.PENDING, **changes)
+
+
+def prune(retention=DONE_RETENTION):
+    """Удаляет выполненные задачи старше retention секунд.
+
+    После этого задачу с тем же ключом идемпотентности можно поставить
+    снова, поэтому retention должен перекрывать окно повторных постановок.
+    """
+    cutoff = timezone.now() - timedelta(seconds=retention)
+    return Task.objects.filter(
+        status=Task.DONE, locked_at__lt=cutoff).delete()[0]
+
+
+def claim(worker_id, limit):
+    """Забирает до limit готовых задач.
+
+    UPDATE с условием на статус работает как compare-and-swap, поэтому
+    две копии воркера не возьмут одну задачу и без SELECT FOR UPDATE.
+    """
+    now = timezone.now()
+    candidates = Task.objects.filter(
+        status=Task.PENDING, run_at__lte=now
+    ).order_by('run_at', 'pk').values_list('pk', flat=True)[:limit]
+    claimed = []
+    for pk in candidates:
+        if Task.objects.filter(pk=pk, status=Task.PENDING).update(
+                status=Task.RUNNING, locked_by=worker_id, locked_at=now):
+            claimed.append(pk)
+    return list(Task.objects.filter(pk__in=claimed).order_by('run_at', 'pk'))
+
+
+def execute(task):
+    """Выполняет задачу и записывает итог: готово, повтор или ошибка."""
+    try:
+        payload = json.loads(task.payload)
+        registry[task.name](*payload['args'], **payload['kwargs'])
+    except Exception:
+        logger.exception('Задача %s (%s) упала', task.pk, task.name)
+        task.attempts += 1
+        task.last_error = traceback.format_exc()
+        if task.attempts < task.max_attempts:
+            task.status = Task.PENDING
+            task.run_at = timezone.now() + backoff(task.attempts)
+        else:
+            task.status = Task.FAILED
+    else:
+        task.attempts += 1
+        task.status = Task.DONE
+        task.last_error = ''
+    task.locked_by = ''
+    task.save(update_fields=[
+        'attempts', 'status', 'run_at', 'last_error', 'locked_by'])
+    return task.status
+
+
+def _execute_in_thread(task):
+    try:
+        return execute(task)
+    finally:
+        close_old_connections()
+
+
+def run_pending(limit=100, worker_id='inline'):
+    """Синхронно выполняет готовые задачи; удобно в тестах и cron."""
+    requeue_stale()
+    return [execute(task) for task in claim(worker_id, limit)]
+
+
+class Worker:
+    """Цикл воркера: забирает задачи и выполняет их в пуле потоков."""
+
+    def __init__(self, workers=WORKERS, poll_interval=POLL_INTERVAL):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+        self.pruned_at = None
+
+    def prune(self):
+        now = time.monotonic()
+        if self.pruned_at is None or now - self.pruned_at >= PRUNE_INTERVAL:
+            self.pruned_at = now
+            prune()
+
+    def run(self, once=False):
+        if self.workers <= 1:
+            return self.run_inline(once)
+        processed = 0
+        with ThreadPoolExecutor(max_workers=self.workers,
+                                thread_name_prefix='taskqueue') as pool:
+            while not self.stopping.is_set():
+                self.prune()
+                requeue_stale()
+                tasks = claim(self.worker_id, self.workers)
+                futures = [pool.submit(_execute_in_thread, task)
+                           for task in tasks]
+                wait(futures)
+                processed += len(futures)
+                if not tasks:
+                    if once:
+                        break
+                    self.stopping.wait(self.poll_interval)
+        return processed
+
+    def run_inline(self, once=False):
+        processed = 0
+        while not self.stopping.is_set():
+            self.prune()
+            statuses = run_pending(self.workers, self.worker_id)
+            processed += len(statuses)
+            if not statuses:
+                if once:
+                    break
+                self.stopping.wait(self.poll_interval)
+        return processed
+
+    def stop(self):
+        self.stopping.set()
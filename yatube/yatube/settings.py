@@ -24,6 +24,7 @@ INSTALLED_APPS = [
     'posts.apps.PostsConfig',
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
+    'taskqueue.apps.TaskqueueConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -34,8 +35,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -47,7 +50,8 @@ ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, который ещё и меряет время рендера.
+        'BACKEND': 'core.profiling.ProfilingTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -72,6 +76,27 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения: пути к копиям базы через os.pathsep.
+REPLICA_DATABASES = []
+for number, name in enumerate(
+        filter(None, os.environ.get('YATUBE_REPLICAS', '').split(os.pathsep))):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Сколько секунд после записи пользователь читает из основной базы.
+REPLICA_PIN_SECONDS = 10
+
+# Потоки для одновременных независимых запросов (core.concurrency.gather).
+# Запросы к локальному SQLite короче накладных расходов на потоки, поэтому
+# по умолчанию выключено; имеет смысл для сетевой базы.
+QUERY_WORKERS = 1
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -108,10 +133,43 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-
-
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+# sorl сам выбирает имена миниатюр, адресация по содержимому ему мешает.
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
+# Сколько секунд хранить файлы без ссылок до collect_images.
+IMAGE_GC_GRACE = 60 * 60
+# Кто решает, можно ли отдать медиафайл (core.views.media).
+MEDIA_ACCESS_CHECK = 'posts.images.is_public'
+# x-accel-redirect (nginx) или x-sendfile (Apache, lighttpd): файл отдаёт
+# фронтовой сервер. Пусто — Django сам, через FileResponse.
+MEDIA_SENDFILE = os.environ.get('YATUBE_MEDIA_SENDFILE', '').lower()
+# internal-location nginx, который смотрит в MEDIA_ROOT.
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# Обработка загруженных картинок постов (posts.images).
+IMAGE_MAX_UPLOAD_SIZE = 20 * 2 ** 20
+IMAGE_MAX_PIXELS = 50 * 10 ** 6
+IMAGE_MAX_DIMENSION = 1920
+# WEBP или JPEG; если Pillow собран без WebP, используется JPEG.
+IMAGE_FORMAT = 'WEBP'
+IMAGE_QUALITY = 80
+
+
+# L1 живёт в памяти воркера, L2 общий для всех воркеров. В продакшене
+# YATUBE_CACHE_DIR должен указывать на общий том или L2_BACKEND — на Redis.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_DIR', os.path.join(BASE_DIR, '.cache')),
+        'OPTIONS': {
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 5,
+            'SYNC_INTERVAL': 1,
+        },
     }
 }
+
+
+# Доля запросов, для которых собираются метрики ProfilingMiddleware.
+PROFILING_SAMPLE_RATE = 1.0 if DEBUG else 0.05
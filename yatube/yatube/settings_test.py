@@ -0,0 +1,11 @@
+"""Настройки тестов: python manage.py test --settings=yatube.settings_test.
+
+Тесты чистят кэш; у них свой L2 в памяти процесса, чтобы не задеть
+запущенный сервер.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES
+
+CACHES['default']['LOCATION'] = 'yatube-tests'
+CACHES['default']['OPTIONS']['L2_BACKEND'] = (
+    'django.core.cache.backends.locmem.LocMemCache')
@@ -1,21 +1,18 @@
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import media, profiling_stats
+
 handler404 = 'core.views.page_not_found'
 handler403 = 'core.views.csrf_failure'
 
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
     path('about/', include('about.urls', namespace='about')),
+    path('admin/profiling/', profiling_stats, name='profiling'),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls')),
-    path('auth/', include('django.contrib.auth.urls'))
+    path('auth/', include('django.contrib.auth.urls')),
+    path(settings.MEDIA_URL.lstrip('/') + '<path:name>', media, name='media'),
 ]
-
-
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )